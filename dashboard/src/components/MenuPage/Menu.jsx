@@ -17,6 +17,7 @@ import {
 } from "../ui/select";
 import { Combobox } from "../ui/combobox";
 import { getUserSettings } from "@/lib/utils";
+import { useStockStore } from "@/stores/useStockStore";
 
 import NumPad from "./UpdateCartDialog";
 import { Button } from "../ui/button";
@@ -75,6 +76,16 @@ const Menu = () => {
 
   const searchInputRef = useRef(null);
 
+  const fetchStock = useStockStore((state) => state.fetchStock);
+  const subscribeStock = useStockStore((state) => state.subscribeStock);
+
+  // stock of the whole menu in one call, then live Bin pushes
+  useEffect(() => {
+    if (menuItems?.length) fetchStock(menuItems.map((item) => item.name));
+  }, [menuItems, fetchStock]);
+
+  useEffect(() => subscribeStock(), [subscribeStock]);
+
    useEffect(() => {
      if (target === "menu") {
        requestAnimationFrame(() => {
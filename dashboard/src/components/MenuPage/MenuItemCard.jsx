@@ -1,7 +1,8 @@
 import { useState } from "react";
 import { cn } from "@/lib/utils";
 import { useCartStore } from "@/stores/useCartStore";
-import { checkStock, getItemUoms, negativeStock, getItemVariants, getUserUomConfig } from "@/lib/utils";
+import { getItemUoms, negativeStock, getItemVariants, getUserUomConfig } from "@/lib/utils";
+import { useStockStore } from "@/stores/useStockStore";
 import { toast } from "sonner";
 
 import { useMenuContext } from "@/contexts/MenuContext";
@@ -63,13 +64,13 @@ const MenuItemCard = ({ item, index }) => {
     try {
       // Stock check
       if (allowNegativeStock === false) {
-        const stockData = await checkStock(item.name);
+        const stockData = await useStockStore.getState().getItemStock(item.name);
         if (stockData?.stock <= 0) {
           toast.error("Error", { description: `No stock available for ${item.item_name}` });
           return;
         }
       } else if (allowNegativeStock === null) {
-        const [stockData, allowNegative] = await Promise.all([checkStock(item.name), negativeStock()]);
+        const [stockData, allowNegative] = await Promise.all([useStockStore.getState().getItemStock(item.name), negativeStock()]);
         if (!allowNegative && stockData?.stock <= 0) {
           toast.error("Error", { description: `No stock available for ${item.item_name}` });
           return;
@@ -1,18 +1,29 @@
 import { useMemo } from "react";
 
+// Lowercased search fields per item, computed once per menu load instead of per keystroke
+const searchKeys = new WeakMap();
+
+function getSearchKey(item) {
+	let key = searchKeys.get(item);
+	if (!key) {
+		key = {
+			text: `${(item.item_name || "").toLowerCase()}\n${(item.name || "").toLowerCase()}`,
+			barcodes: new Set(
+				(item.barcodes || [])
+					.filter(Boolean)
+					.map((b) => String(b).trim().toLowerCase())
+			),
+		};
+		searchKeys.set(item, key);
+	}
+	return key;
+}
+
 function matchesSearch(item, term) {
 	if (!term) return true;
 
-	const itemName = (item.item_name || "").toLowerCase();
-	const name = (item.name || "").toLowerCase();
-	const matchesName = itemName.includes(term) || name.includes(term);
-
-	const barcodes = item.barcodes || [];
-	const matchesBarcode = barcodes.some(
-		(b) => b && String(b).trim().toLowerCase() === term
-	);
-
-	return matchesName || matchesBarcode;
+	const key = getSearchKey(item);
+	return key.text.includes(term) || key.barcodes.has(term);
 }
 
 export function filterMenuItemsByTerm(menuItems, searchTerm, selectedCategoryId) {
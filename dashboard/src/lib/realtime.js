@@ -0,0 +1,34 @@
+import { io } from "socket.io-client";
+
+let socket = null;
+
+/**
+ * Shared Frappe realtime (socket.io) connection.
+ * The site namespace comes from the page (`window.site_name`), falling back to the host name.
+ */
+export function getSocket() {
+  if (socket) return socket;
+
+  const siteName = window.site_name || window.location.hostname;
+  socket = io(`${window.location.origin}/${siteName}`, {
+    withCredentials: true,
+    reconnectionAttempts: Infinity,
+  });
+  return socket;
+}
+
+/**
+ * Listen to a realtime event. `onReconnect` runs after a dropped connection comes back,
+ * so callers can reload state for events missed while offline.
+ * Returns an unsubscribe function.
+ */
+export function subscribe(event, handler, onReconnect) {
+  const s = getSocket();
+  s.on(event, handler);
+  if (onReconnect) s.io.on("reconnect", onReconnect);
+
+  return () => {
+    s.off(event, handler);
+    if (onReconnect) s.io.off("reconnect", onReconnect);
+  };
+}
@@ -886,6 +886,47 @@ export async function closeShift() {
   }, "Close shift");
 }
 
+export async function getFloorSnapshot() {
+  return attemptWithRetries(
+    async () => {
+      const { message } = await call.get(
+        "havano_restaurant_pos.api.get_floor_snapshot"
+      );
+      return message; // { server_time, tables: [...] }
+    },
+    "Fetch floor snapshot"
+  );
+}
+
+export async function getKdsTickets(station, includeBumped = false) {
+  return attemptWithRetries(
+    async () => {
+      const { message } = await call.get(
+        "havano_restaurant_pos.api.get_kds_tickets",
+        { station, include_bumped: includeBumped ? 1 : 0 }
+      );
+      return message; // { station, tickets: [...], bumped?: [...] }
+    },
+    `Fetch KDS tickets for station ${station}`
+  );
+}
+
+export async function bumpKdsTicket(station, ticketId) {
+  const { message } = await call.post(
+    "havano_restaurant_pos.api.bump_kds_ticket",
+    { station, ticket_id: ticketId }
+  );
+  return message;
+}
+
+export async function recallKdsTicket(station, ticketId) {
+  const { message } = await call.post(
+    "havano_restaurant_pos.api.recall_kds_ticket",
+    { station, ticket_id: ticketId }
+  );
+  return message;
+}
+
 export async function fetchTableOrders(table_number) {
   return attemptWithRetries(
     async () => {
@@ -907,6 +948,15 @@ export async function checkStock(itemName) {
     return message;
   }, `Check stock for ${itemName}`);
 }
+export async function checkStockBulk(itemCodes) {
+  return attemptWithRetries(async () => {
+    const { message } = await call.post(
+      "havano_restaurant_pos.api.get_stock_bulk",
+      { item_codes: itemCodes }
+    );
+    return message; // { warehouse, stock: { item_code: qty } }
+  }, `Check stock for ${itemCodes.length} items`);
+}
 export async function addRemark(remark) {
   if (!remark || !remark.trim()) {
     throw new Error("Remark cannot be empty");
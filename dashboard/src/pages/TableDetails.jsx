@@ -93,7 +93,6 @@ const TableDetails = () => {
     loadingTableDetails,
     errorTableDetails,
     fetchTableDetails,
-    fetchTables,
   } = useTableStore();
 
   const { startTableOrder, loadCartFromOrder, clearCart } = useCartStore();
@@ -341,8 +340,7 @@ const TableDetails = () => {
       if (id) {
         await fetchTableOrders(id);
         await fetchTableDetails(id);
-        // Refresh tables list to reflect latest changes
-        await fetchTables();
+        // The tables board is updated by the server's floor push
       }
     }
   };
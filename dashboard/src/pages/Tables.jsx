@@ -3,40 +3,28 @@ import { Utensils } from "lucide-react";
 import { Link } from "react-router-dom";
 import { Card, CardHeader, CardTitle, CardContent } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
-import { getBgColor, fetchTableOrders } from "@/lib/utils";
+import { getBgColor } from "@/lib/utils";
 import { useTableStore } from "@/stores/useTableStore";
 import Loader from "@/components/Loader";
 import Error from "@/components/Error";
 import Container from "@/components/Shared/Container";
 
 const Tables = () => {
-  const { tables, floors, loadingTables, loadingFloors, errorTables, errorFloors, fetchTables, fetchFloors } = useTableStore();
-  const [tableStats, setTableStats] = useState({});
+  const { tables, floors, loadingTables, loadingFloors, errorTables, errorFloors, fetchTables, fetchFloors, subscribeFloor, getWaitingMinutes } = useTableStore();
+  const [, setTick] = useState(0);
 
-  // fetch tables and floors first
+  // load the floor snapshot once, then follow server pushes
   useEffect(() => {
     fetchTables();
     fetchFloors();
-  }, [fetchTables, fetchFloors]);
+    return subscribeFloor();
+  }, [fetchTables, fetchFloors, subscribeFloor]);
 
-  // fetch orders for all tables
+  // waiting times are derived locally, re-render once a minute
   useEffect(() => {
-    const fetchStats = async () => {
-      const stats = {};
-      for (let table of tables) {
-        try {
-          const data = await fetchTableOrders(table.table_number);
-          stats[table.name] = data; // { total_orders, waiting_time }
-        } catch (err) {
-          console.error("Failed to fetch table orders", err);
-          stats[table.name] = { total_orders: 0, waiting_time: 0 };
-        }
-      }
-      setTableStats(stats);
-    };
-
-    if (tables.length) fetchStats();
-  }, [tables]);
+    const timer = setInterval(() => setTick((tick) => tick + 1), 60000);
+    return () => clearInterval(timer);
+  }, []);
 
   if (loadingTables || loadingFloors) return <Loader />;
   if (errorTables || errorFloors) return <Error />;
@@ -58,8 +46,8 @@ const Tables = () => {
                   </div>
                 </div>
                 <p className="text-gray-400 text-sm">Capacity: {table.capacity}</p>
-                <p className="text-gray-400 text-sm">Total Orders: {tableStats[table.name]?.total_orders || 0}</p>
-                <p className="text-gray-400 text-sm">Waiting Time: {tableStats[table.name]?.waiting_time || 0} mins</p>
+                <p className="text-gray-400 text-sm">Total Orders: {table.open_orders || 0}</p>
+                <p className="text-gray-400 text-sm">Waiting Time: {getWaitingMinutes(table)} mins</p>
               </CardContent>
             </Card>
           </Link>
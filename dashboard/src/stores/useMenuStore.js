@@ -1,39 +1,57 @@
 import { create } from "zustand";
 
 import { db } from "@/lib/frappeClient";
-export const useMenuStore = create((set) => ({
+export const useMenuStore = create((set, get) => ({
   menuItems: [],
   menuCategories: [],
   productBundles: [],
   loading: false,
   error: null,
 
-  // Fetch all menu items
-fetchMenuItems: async () => {
-  set({ loading: true, error: null });
-  try {
-// 1️⃣ Fetch all items
-const data = await db.getDocList("Item", {
-  fields: ["name", "standard_rate", "item_name", "custom_menu_category", "item_group"],
-  filters: [
-    ["custom_do_not_show_in_pos", "=", 0],
-    ["disabled", "=", 0],
-    ["variant_of", "=", null] 
-  ],
-  limit: 0,
-  });
+  // Catalog sync cursor returned by get_menu_items_delta
+  menuVersion: null,
+  menuSyncedAt: null,
 
-    const res = await fetch("/api/method/havano_restaurant_pos.api.get_menu_items_with_user_prices", {
-      method: "GET",
-      credentials: "include",
-    });
+  // Fetch menu items; after the first load only changed items are downloaded
+  fetchMenuItems: async () => {
+    set({ loading: true, error: null });
+    try {
+      const { menuVersion, menuSyncedAt, menuItems } = get();
+      const params = new URLSearchParams();
+      if (menuSyncedAt) params.set("since", menuSyncedAt);
+      if (menuVersion) params.set("version", menuVersion);
+
+      const res = await fetch(
+        `/api/method/havano_restaurant_pos.api.get_menu_items_delta?${params.toString()}`,
+        {
+          method: "GET",
+          credentials: "include",
+        }
+      );
 
-    const pricedItems = (await res.json()).message;
+      const delta = (await res.json()).message;
 
-    // keep only parents
-    const parentItems = pricedItems.filter(item => !item.variant_of);
+      let items;
+      if (delta.full) {
+        items = delta.upserts;
+      } else {
+        const removed = new Set(delta.removed);
+        const byName = new Map(
+          menuItems.filter((item) => !removed.has(item.name)).map((item) => [item.name, item])
+        );
+        delta.upserts.forEach((item) => byName.set(item.name, item));
+        items = Array.from(byName.values());
+      }
 
-set({ menuItems: parentItems, loading: false });
+      // keep only parents
+      const parentItems = items.filter((item) => !item.variant_of);
+
+      set({
+        menuItems: parentItems,
+        menuVersion: delta.version,
+        menuSyncedAt: delta.server_time,
+        loading: false,
+      });
     } catch (err) {
       console.error("Fetch error:", err);
       set({ error: err.message, loading: false });
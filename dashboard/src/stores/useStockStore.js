@@ -0,0 +1,49 @@
+import { create } from "zustand";
+
+import { subscribe } from "@/lib/realtime";
+import { checkStock, checkStockBulk } from "@/lib/utils";
+
+const STOCK_EVENT = "havano_stock_update";
+
+export const useStockStore = create((set, get) => ({
+	warehouse: null,
+	// Sellable quantity: Bin stock less what open orders have reserved
+	stock: {},
+
+	// One request for the whole menu
+	fetchStock: async (itemCodes) => {
+		if (!itemCodes?.length) return;
+		try {
+			const data = await checkStockBulk(itemCodes);
+			if (!data || data.error) return;
+			set((state) => ({
+				warehouse: data.warehouse,
+				stock: { ...state.stock, ...(data.projected ?? data.stock) },
+			}));
+		} catch (err) {
+			console.error("Stock fetch error:", err);
+		}
+	},
+
+	// Known quantity, or a single get_stock call for items not loaded yet
+	getItemStock: async (itemCode) => {
+		const known = get().stock[itemCode];
+		if (known !== undefined) return { item_code: itemCode, stock: known };
+
+		const data = await checkStock(itemCode);
+		if (data && !data.error) {
+			const available = data.projected ?? data.stock;
+			set((state) => ({ stock: { ...state.stock, [itemCode]: available } }));
+			return { ...data, stock: available };
+		}
+		return data;
+	},
+
+	// Bin and reservation changes pushed by the server, for this till's warehouse only
+	applyStockUpdate: (update) => {
+		if (!update || update.warehouse !== get().warehouse) return;
+		set((state) => ({ stock: { ...state.stock, ...(update.projected ?? update.stock) } }));
+	},
+
+	subscribeStock: () => subscribe(STOCK_EVENT, get().applyStockUpdate),
+}));
@@ -1,12 +1,20 @@
 import { create } from "zustand";
 
 import { db } from "@/lib/frappeClient";
-import TableDetails from "@/pages/TableDetails";
+import { subscribe } from "@/lib/realtime";
+import { getFloorSnapshot } from "@/lib/utils";
 
-export const useTableStore = create((set) => ({
+const FLOOR_EVENT = "havano_floor_update";
+
+// server_time - local time, so waiting times do not depend on the tablet clock
+const clockOffset = (serverTime) =>
+	serverTime ? new Date(serverTime.replace(" ", "T")).getTime() - Date.now() : 0;
+
+export const useTableStore = create((set, get) => ({
 	tables: [],
 	floors: [],
 	tableDetails: {},
+	serverOffset: 0,
 	loadingTables: false,
 	loadingFloors: false,
 	loadingTableDetails: false,
@@ -17,16 +25,47 @@ export const useTableStore = create((set) => ({
 	fetchTables: async () => {
 		set({ loadingTables: true, errorTables: null });
 		try {
-			const data = await db.getDocList("HA Table", {
-				fields: ["name", "table_number", "capacity", "status", "floor"],
+			const data = await getFloorSnapshot();
+			set({
+				tables: data?.tables || [],
+				serverOffset: clockOffset(data?.server_time),
+				loadingTables: false,
 			});
-			set({ tables: data, loadingTables: false });
 		} catch (err) {
 			console.error("Table fetch error:", err);
 			set({ errorTables: err.message, loadingTables: false });
 		}
 	},
 
+	// Apply a floor diff pushed by the server
+	applyFloorUpdate: (update) => {
+		if (!update) return;
+		const changed = new Map((update.tables || []).map((row) => [row.name, row]));
+		const removed = new Set(update.removed || []);
+
+		const tables = get()
+			.tables.filter((table) => !removed.has(table.name))
+			.map((table) => changed.get(table.name) || table);
+		const known = new Set(tables.map((table) => table.name));
+		for (const row of changed.values()) {
+			if (!known.has(row.name)) tables.push(row);
+		}
+		tables.sort((a, b) => (a.table_number || 0) - (b.table_number || 0));
+
+		set({ tables, serverOffset: clockOffset(update.server_time) });
+	},
+
+	// Keep the board live; reloads the full snapshot after a reconnect. Returns unsubscribe.
+	subscribeFloor: () =>
+		subscribe(FLOOR_EVENT, get().applyFloorUpdate, get().fetchTables),
+
+	getWaitingMinutes: (table) => {
+		if (!table?.last_order_at) return 0;
+		const lastOrder = new Date(table.last_order_at.replace(" ", "T")).getTime();
+		const now = Date.now() + get().serverOffset;
+		return Math.max(0, Math.floor((now - lastOrder) / 60000));
+	},
+
 	fetchFloors: async () => {
 		set({ loadingFloors: true, errorFloors: null });
 		try {
@@ -1,7 +1,8 @@
 __version__ = "0.0.1"
 
 # Apply trial balance currency conversion fix when module is imported
-# This ensures the fix is applied as soon as the app is loaded
+# This ensures the fix is applied once per worker, as soon as the app is loaded
+# (there is no per-request hook for it)
 try:
     from havano_restaurant_pos.overrides import apply_trial_balance_fix
     apply_trial_balance_fix()
@@ -1,6 +1,6 @@
 import frappe
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import cint, flt
 from datetime import datetime
 
 @frappe.whitelist()
@@ -58,12 +58,11 @@ def get_default_customer():
     Returns None if not found.
     """
     try:
-        ha_settings = frappe.get_single("HA POS Settings")
-
-        if ha_settings and hasattr(ha_settings, "default_customer"):
-            return ha_settings.default_customer
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_pos_setting,
+        )
 
-        return None
+        return get_pos_setting("default_customer")
 
     except Exception as e:
         frappe.log_error(f"Error fetching default customer: {str(e)}\n{frappe.get_traceback()}", "Error fetching default customer")
@@ -83,30 +82,22 @@ def get_user_mapping_defaults():
     default_warehouse = None
 
     try:
-        settings = frappe.get_single("HA POS Settings")
-        if settings.user_mapping:
-            for row in settings.user_mapping:
-                if row.user == user:
-                    cost_center = getattr(row, "cost_center", None)
-                    default_warehouse = getattr(row, "default_warehouse", None)
-                    allowed_reprint_invoice = getattr(row, "allowed_reprint_invoice", False)
-                    allowed_credit_note = getattr(row, "allowed_credit_note", False)
-
-                    # Debug print bro
-                    print(f"[DEBUG] User Mapping for {user} -> cost_center: {cost_center}, default_warehouse: {default_warehouse}, allowed_reprint_invoice: {allowed_reprint_invoice}, allowed_credit_note: {allowed_credit_note}")
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_user_mapping,
+        )
 
-                    return {
-                        "cost_center": cost_center,
-                        "default_warehouse": default_warehouse,
-                        "allowed_reprint_invoice": allowed_reprint_invoice,
-                        "allowed_credit_note": allowed_credit_note,
-                    }
+        row = get_user_mapping(user)
+        if row:
+            return {
+                "cost_center": row.get("cost_center"),
+                "default_warehouse": row.get("default_warehouse"),
+                "allowed_reprint_invoice": row.get("allowed_reprint_invoice") or False,
+                "allowed_credit_note": row.get("allowed_credit_note") or False,
+            }
 
     except Exception as e:
         frappe.log_error(f"Error getting user mapping defaults: {str(e)}", "Get User Mapping Defaults Error")
 
-    # If no mapping found, also print debug
-    print(f"[DEBUG] No mapping found for user {user}. Returning defaults.")
     return {
         "cost_center": cost_center,
         "default_warehouse": default_warehouse,
@@ -381,42 +372,15 @@ def get_item_by_barcode(barcode=None):
         return None
     barcode = str(barcode).strip()
     try:
-        item_code = frappe.db.get_value(
-            "Item Barcode",
-            {"barcode": barcode},
-            "parent"
-        )
-        if not item_code:
-            return None
-        items = frappe.get_all(
-            "Item",
-            filters={
-                "name": item_code,
-                "disabled": 0,
-                "custom_do_not_show_in_pos": 0,
-            },
-            fields=["name", "item_name", "item_group", "custom_menu_category", "standard_rate", "image"],
-            limit=1,
-        )
-        item = items[0] if items else None
-        if not item:
+        from havano_restaurant_pos.search import lookup_barcode
+
+        item = lookup_barcode(barcode)
+        if not item or item.get("custom_do_not_show_in_pos"):
             return None
-        user = frappe.session.user
-        settings = frappe.get_single("HA POS Settings")
-        user_price_list = None
-        for row in settings.user_mapping:
-            if row.user == user:
-                user_price_list = row.price_list
-                break
-        if user_price_list:
-            rate = frappe.db.get_value(
-                "Item Price",
-                {"item_code": item_code, "price_list": user_price_list},
-                "price_list_rate"
-            )
-            if rate is not None:
-                item["standard_rate"] = rate
-        return item
+        return {
+            field: item.get(field)
+            for field in ["name", "item_name", "item_group", "custom_menu_category", "standard_rate", "image"]
+        }
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "Get Item By Barcode Error")
         return None
@@ -424,27 +388,11 @@ def get_item_by_barcode(barcode=None):
 
 @frappe.whitelist()
 def search_items(search_term=None):
-    """Search for items by name or code"""
-    filters = {"disabled": 0}
+    """Search for items by name or code (prefix / token match, then substring), priced for the user"""
+    from havano_restaurant_pos.search import search
 
-    if search_term:
-        filters["item_name"] = ["like", f"%{search_term}%"]
-
-    items = frappe.get_all(
-        "Item",
-        fields=[
-            "name",
-            "item_code",
-            "item_name",
-            "description",
-            "stock_uom",
-            "standard_rate",
-        ],
-        filters=filters,
-        order_by="item_name",
-        limit=20,
-    )
-    return items
+    fields = ["name", "item_code", "item_name", "description", "stock_uom", "standard_rate"]
+    return [{field: item.get(field) for field in fields} for item in search(search_term)]
 
 
 @frappe.whitelist()
@@ -461,8 +409,8 @@ def get_number_of_items(item_group=None):
 @frappe.whitelist()
 def create_order_from_cart(payload):
     """Create an order from the cart"""
+    from havano_restaurant_pos.floor import mark_tables_dirty
 
-    print(f"------------------------Order {payload}")
     try:
         if isinstance(payload, str):
             import json
@@ -506,8 +454,6 @@ def create_order_from_cart(payload):
         if order.order_type == "Take Away":
             order.create_invoice()
 
-        frappe.db.commit()
-
         table_name = payload.get("table")
         if table_name and order.order_type == "Dine In":
             table = frappe.get_doc("HA Table", table_name)
@@ -515,7 +461,10 @@ def create_order_from_cart(payload):
             table.customer_name = safe(payload.get("customer_name"))
             table.status = "Occupied"
             table.save(ignore_permissions=True)
-            frappe.db.commit()
+
+        # one floor update for the order and the table change
+        mark_tables_dirty([table_name])
+        frappe.db.commit()
 
         return {
             "success": True,
@@ -683,7 +632,17 @@ def get_table_orders(table_number):
     - total_orders: Number of draft orders for the table
     - waiting_time: Minutes since the last draft order was created
     """
-    # get all draft orders for this table
+    from havano_restaurant_pos.floor import get_table_snapshot_by_number, get_waiting_minutes
+
+    # served from the maintained floor snapshot (open orders per table)
+    row = get_table_snapshot_by_number(table_number)
+    if row:
+        return {
+            "total_orders": row.get("open_orders") or 0,
+            "waiting_time": get_waiting_minutes(row),
+        }
+
+    # orders whose table is not on the floor (e.g. deleted table): indexed lookup
     draft_orders = frappe.get_all(
         "HA Order",
         filters={"table_number": table_number, "docstatus": 0},
@@ -711,6 +670,17 @@ def get_table_orders(table_number):
     }
 
 
+@frappe.whitelist()
+def get_floor_snapshot():
+    """
+    Table board snapshot: status, waiter, open order count and last order time per table.
+    Clients load it once and then apply the diffs published on "havano_floor_update".
+    """
+    from havano_restaurant_pos.floor import get_floor_snapshot as _get_floor_snapshot
+
+    return _get_floor_snapshot()
+
+
 import json 
 @frappe.whitelist()
 def download_order_json_by_order_id():
@@ -889,8 +859,6 @@ def get_number_of_orders(menu_item):
 
 @frappe.whitelist()
 def process_table_payment(table, order_ids, total, amount=None, payment_method=None, note=None, payment_breakdown=None):
-
-    print("ITS A HIT")
     """Process payment for all orders in a table.
     
     Creates sales invoice, payment entry, updates HA Orders, submits orders, marks as closed.
@@ -904,10 +872,13 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
         note: Payment note (optional)
         payment_breakdown: Payment breakdown array (optional)
     """
+    from havano_restaurant_pos.floor import mark_tables_dirty
+    from havano_restaurant_pos.payment_routing import get_payment_route
+    from havano_restaurant_pos.settlement import close_orders, load_settleable_orders, merge_order_items
+
     try:
         # Get customer from table or use default
-        table_doc = frappe.get_doc("HA Table", table)
-        customer = table_doc.customer_name or get_default_customer()
+        customer = frappe.db.get_value("HA Table", table, "customer_name") or get_default_customer()
         
         if not customer:
             return {
@@ -923,30 +894,10 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
                 "message": "Company is required. Please set a default company.",
             }
         
-        # Get all orders and collect items
-        order_items = []
-        orders_to_update = []
-        
-        for order_id in order_ids:
-            if not frappe.db.exists("HA Order", order_id):
-                continue
-                
-            order_doc = frappe.get_doc("HA Order", order_id)
-            
-            # Only process unpaid orders (check if payment_entry exists or order_status is not Closed)
-            if order_doc.payment_entry or order_doc.order_status == "Closed":
-                continue
-            
-            # Collect items from this order
-            for order_item in order_doc.order_items:
-                order_items.append({
-                    "menu_item": order_item.menu_item,
-                    "qty": order_item.qty,
-                    "rate": order_item.rate,
-                    "amount": order_item.amount,
-                })
-            
-            orders_to_update.append(order_doc)
+        # Load unpaid orders and their items in two queries
+        if isinstance(order_ids, str):
+            order_ids = frappe.parse_json(order_ids)
+        orders_to_update, order_items = load_settleable_orders(order_ids)
         
         if not order_items:
             return {
@@ -955,17 +906,7 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
             }
         
         # Merge items with same menu_item and rate
-        merged_items = []
-        for item in order_items:
-            found = False
-            for merged in merged_items:
-                if merged["menu_item"] == item["menu_item"] and merged["rate"] == item["rate"]:
-                    merged["qty"] = merged["qty"] + item["qty"]
-                    merged["amount"] = merged["qty"] * merged["rate"]
-                    found = True
-                    break
-            if not found:
-                merged_items.append(item.copy())
+        merged_items = merge_order_items(order_items)
         
         # Create Sales Invoice
         from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_invoice.ha_pos_invoice import (
@@ -1039,19 +980,9 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
                         break
                 
                 # Get account from mode of payment
-                mode_account = default_paid_to_account
-                if primary_method and primary_method != "Cash":
-                    mode_accounts = frappe.get_all(
-                        "Mode of Payment Account",
-                        filters={"parent": primary_method, "company": company},
-                        fields=["default_account"],
-                        limit=1
-                    )
-                    if mode_accounts and mode_accounts[0].default_account:
-                        mode_account = mode_accounts[0].default_account
+                mode_account = get_payment_route(company, primary_method).account or default_paid_to_account
                 
                 # Create payment entry for non-credit total
-                print("Creating payment entry for non-credit total:1")
                 payment_entry = frappe.new_doc("Payment Entry")
                 payment_entry.payment_type = "Receive"
                 payment_entry.party_type = "Customer"
@@ -1111,19 +1042,9 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
                 default_paid_to_account = company_data.get("default_cash_account") or paid_from_account
                 
                 # Get account from mode of payment
-                mode_account = default_paid_to_account
-                if payment_method and payment_method != "Cash":
-                    mode_accounts = frappe.get_all(
-                        "Mode of Payment Account",
-                        filters={"parent": payment_method, "company": company},
-                        fields=["default_account"],
-                        limit=1
-                    )
-                    if mode_accounts and mode_accounts[0].default_account:
-                        mode_account = mode_accounts[0].default_account
+                mode_account = get_payment_route(company, payment_method).account or default_paid_to_account
                 
                 # Create payment entry
-                print("Creating payment entry for non-credit total 22",)
                 payment_entry = frappe.new_doc("Payment Entry")
                 payment_entry.payment_type = "Receive"
                 payment_entry.party_type = "Customer"
@@ -1157,49 +1078,30 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
                     frappe.flags.ignore_links = False
         
         # Update HA Orders with invoice and payment, submit, and mark as closed
-        for order_doc in orders_to_update:
-            order_doc.sales_invoice = invoice_name
-            if payment_entry_name:
-                order_doc.payment_entry = payment_entry_name
-            order_doc.order_status = "Closed"
-            
-            # Submit order if not already submitted
-            if order_doc.docstatus == 0:
-                order_doc.submit()
-            else:
-                order_doc.save(ignore_permissions=True)
+        order_names = [order.name for order in orders_to_update]
+        close_orders(order_names, invoice_name, payment_entry_name)
         
         # Update table status
-        table_doc.status = "Available"
-        table_doc.save(ignore_permissions=True)
+        frappe.db.set_value("HA Table", table, "status", "Available")
+        mark_tables_dirty([table])
         
-        frappe.db.commit()
-        # ---- Update Sales Invoice custom_kot (trial & error safe) ----
+        # ---- Update Sales Invoice custom_kot (same transaction) ----
         try:
-            if orders_to_update:
-                first_order_id = orders_to_update[0].name
-
-                frappe.db.set_value(
-                    "Sales Invoice",
-                    invoice_name,
-                    "custom_kot",
-                    first_order_id
-                )
-
-                frappe.db.commit()
-
-        except Exception as e:
+            frappe.db.set_value("Sales Invoice", invoice_name, "custom_kot", order_names[0])
+        except Exception:
             frappe.log_error(
                 message=frappe.get_traceback(),
                 title="Failed to update Sales Invoice custom_kot"
             )
+        
+        frappe.db.commit()
                 
         return {
             "success": True,
             "message": "Table payment processed successfully",
             "sales_invoice": invoice_name,
             "payment_entry": payment_entry_name,
-            "order_ids": [order.name for order in orders_to_update],
+            "order_ids": order_names,
         }
         
     except Exception as e:
@@ -1215,6 +1117,8 @@ def process_table_payment(table, order_ids, total, amount=None, payment_method=N
 
 @frappe.whitelist()
 def mark_table_as_paid(table):
+    from havano_restaurant_pos.floor import mark_tables_dirty
+
     try:
         default_dine_in_customer = frappe.db.get_single_value(
             "Sample Pos Settings", "default_dine_in_customer"
@@ -1285,6 +1189,7 @@ def mark_table_as_paid(table):
             )
         sales_invoice.insert(ignore_permissions=True)
         sales_invoice.submit()
+        mark_tables_dirty([table])
         frappe.db.commit()
 
         return {
@@ -1512,7 +1417,7 @@ def create_order_and_payment(payload, amount=None, payment_method=None, note=Non
         received_amount = paid_amount
         if paid_from_currency != paid_to_currency:
             try:
-                from erpnext.setup.utils import get_exchange_rate
+                from havano_restaurant_pos.exchange_rates import get_exchange_rate
                 # Get exchange rate from company currency (paid_from) to payment currency (paid_to)
                 target_exchange_rate = get_exchange_rate(
                     paid_from_currency, paid_to_currency, frappe.utils.nowdate()
@@ -2287,6 +2192,15 @@ def process_payment_for_transaction_background(
     This runs asynchronously in the queue.
     IMPORTANT: This function must be callable from frappe.enqueue.
     """
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_pos_setting,
+    )
+    from havano_restaurant_pos.payment_routing import (
+        get_payment_route,
+        get_payment_routes,
+        make_tender_journal_entries,
+    )
+
     frappe.set_user("Administrator")  # Ensure proper permissions in background job
     try:
         # Get the document
@@ -2391,13 +2305,9 @@ def process_payment_for_transaction_background(
                 "message": "Payment amount must be greater than 0",
             }
 
-        # Get company accounts (optimized: single query)
-        company_data = frappe.get_cached_value(
-            "Company",
-            company,
-            ["default_currency", "default_receivable_account", "default_cash_account"],
-            as_dict=True
-        )
+        # Company accounts and per-tender routes come from the cached routing table
+        routes = get_payment_routes(company)
+        company_data = routes["company"]
         
         if not company_data:
             return {
@@ -2406,9 +2316,8 @@ def process_payment_for_transaction_background(
                 "details": f"Company {company} does not exist.",
             }
         
-        company_currency = company_data.get("default_currency")
-        paid_from_account = company_data.get("default_receivable_account")
-        paid_to_account = company_data.get("default_cash_account") or paid_from_account
+        paid_from_account = company_data.get("paid_from")
+        paid_to_account = company_data.get("paid_to")
 
         if not paid_from_account or not paid_to_account:
             return {
@@ -2417,17 +2326,12 @@ def process_payment_for_transaction_background(
                 "details": "Company is missing default receivable or cash account. Please configure company defaults.",
             }
 
-        # Get account currencies in one query (optimized)
-        account_currencies = frappe.get_all(
-            "Account",
-            filters={"name": ["in", [paid_from_account, paid_to_account]]},
-            fields=["name", "account_currency"],
-            as_list=False
-        )
-        account_currency_map = {acc["name"]: acc.get("account_currency") or company_currency for acc in account_currencies}
-        
-        paid_from_currency = account_currency_map.get(paid_from_account, company_currency)
-        paid_to_currency = account_currency_map.get(paid_to_account, company_currency)
+        paid_from_currency = company_data.get("paid_from_currency")
+        paid_to_currency = company_data.get("paid_to_currency")
+
+        # Consolidated mode: the tenders post as one Journal Entry per currency after the loop
+        consolidate = bool(get_pos_setting("consolidate_split_payments")) and len(payments_list) > 1
+        journal_tenders = []
 
         # Create payment entries for each payment method
         created_payments = []
@@ -2450,91 +2354,21 @@ def process_payment_for_transaction_background(
             if paid_amount <= 0:
                 continue
 
-            # Check if payment method is credit - skip payment entry creation for credit methods
-            try:
-                is_credit = is_payment_method_credit(method)
-            except Exception as credit_check_error:
-                frappe.log_error(f"Error checking credit status for {method}: {str(credit_check_error)}", "Credit Check Error")
-                is_credit = False
+            # Account, currency, type, credit and bank flags for this tender (no queries)
+            route = get_payment_route(company, method)
             
-            if is_credit:
+            if route.is_credit:
                 # For credit methods, just reduce outstanding but don't create payment entry
                 remaining_outstanding -= paid_amount
                 credit_payments_total += paid_amount
                 credit_payments_count += 1
                 continue
 
-            # Validate mode of payment exists and get default account
-            # IMPORTANT: Ensure mode_of_payment exists in database (Link field requirement)
             original_method = method  # Preserve original method name for payment entry
-            
-            # Validate that the mode of payment exists (required for Link field)
-            mode_exists = frappe.db.exists("Mode of Payment", method) if method else False
-            
-            # If mode doesn't exist, try to create it
-            if not mode_exists and method and method != "Cash":
-                try:
-                    # Try to create the Mode of Payment if it doesn't exist
-                    new_mode = frappe.new_doc("Mode of Payment")
-                    new_mode.mode_of_payment = method
-                    new_mode.type = "Cash"  # Default type
-                    new_mode.insert(ignore_permissions=True)
-                    frappe.db.commit()
-                    mode_exists = True
-                    frappe.log_error(
-                        f"Created new Mode of Payment '{method}' automatically",
-                        "Mode of Payment Auto-Created"
-                    )
-                except Exception as create_error:
-                    # If creation fails, log error but continue - we'll use ignore_links
-                    frappe.log_error(
-                        f"Mode of Payment '{method}' does not exist and could not be created: {str(create_error)}. Will use ignore_links to bypass validation.",
-                        "Mode of Payment Creation Failed"
-                    )
-            
-            # Use original method for payment entry (ignore_links will bypass validation if mode doesn't exist)
-            # We always use the original method name - ignore_links will handle validation
-            
-            # Get default account from Mode of Payment Account
-            mode_account = None
-            if method and method != "Cash":
-                mode_accounts = frappe.get_all(
-                    "Mode of Payment Account",
-                    filters={"parent": method, "company": company},
-                    fields=["default_account"],
-                    limit=1
-                )
-                if mode_accounts and mode_accounts[0].default_account:
-                    mode_account = mode_accounts[0].default_account
-            
-            # If no mode account found, use company default cash account
-            if not mode_account:
-                mode_account = paid_to_account
-
-            # Get account currency for mode account
-            mode_account_currency = frappe.get_cached_value("Account", mode_account, "account_currency") or company_currency
-            
-            # Get mode of payment type to check if it's Bank (requires reference_no and reference_date)
-            # Check mode type more reliably - try to get it even if mode_exists check failed
-            mode_type = None
-            if original_method:
-                try:
-                    # Try to get mode type directly from database
-                    mode_type = frappe.get_cached_value("Mode of Payment", original_method, "type")
-                except Exception:
-                    # If cached value fails, try direct query
-                    try:
-                        mode_doc = frappe.get_doc("Mode of Payment", original_method)
-                        mode_type = mode_doc.type if hasattr(mode_doc, 'type') else None
-                    except Exception:
-                        mode_type = None
-            
-            # Also check if the account type is Bank
-            account_type = None
-            try:
-                account_type = frappe.get_cached_value("Account", mode_account, "account_type")
-            except Exception:
-                pass
+            mode_account = route.account
+            mode_account_currency = route.currency
+            mode_type = route.mode_type
+            account_type = route.account_type
 
             source_exchange_rate = 1.0
             target_exchange_rate = 1.0
@@ -2544,7 +2378,7 @@ def process_payment_for_transaction_background(
 
             if paid_from_currency != mode_account_currency:
                 try:
-                    from erpnext.setup.utils import get_exchange_rate
+                    from havano_restaurant_pos.exchange_rates import get_exchange_rate
                     # Get exchange rate from company currency to payment currency
                     target_exchange_rate = get_exchange_rate(
                         paid_from_currency, mode_account_currency, frappe.utils.nowdate()
@@ -2556,6 +2390,20 @@ def process_payment_for_transaction_background(
                     target_exchange_rate = 1.0
                     received_amount = paid_amount
 
+            if consolidate:
+                journal_tenders.append(
+                    {
+                        "mode_of_payment": original_method,
+                        "account": mode_account,
+                        "currency": mode_account_currency,
+                        "amount": received_amount,
+                        "base_amount": paid_amount,
+                        "is_bank": route.is_bank,
+                    }
+                )
+                remaining_outstanding -= paid_amount
+                continue
+
             # Create payment entry
             try:
                 print("payment entry creation started for method:11")
@@ -2758,12 +2606,33 @@ def process_payment_for_transaction_background(
                 # Continue with other payment methods even if one fails
                 continue
 
+        if journal_tenders:
+            try:
+                created_payments.extend(
+                    make_tender_journal_entries(
+                        company,
+                        customer,
+                        journal_tenders,
+                        doc.get("debit_to") or paid_from_account,
+                        doc.get("party_account_currency") or paid_from_currency,
+                        reference_doctype=doctype,
+                        reference_name=docname,
+                        remark=note or f"Payment for {doctype} {docname}",
+                    )
+                )
+            except Exception as e:
+                error_msg = f"Failed to create journal entry for {doctype} {docname}: {e!s}"
+                error_messages.append(error_msg)
+                frappe.log_error(f"{error_msg}\nTraceback: {frappe.get_traceback()}", "Payment Entry Error")
+
         # Single commit at the end (optimized: batch commit)
-        if created_payments:
-            frappe.db.commit()
-        else:
-            # Rollback if no payments were created
-            frappe.db.rollback()
+        # In batch checkout the caller owns the transaction and commits once per batch
+        if not frappe.flags.get("in_checkout_batch"):
+            if created_payments:
+                frappe.db.commit()
+            else:
+                # Rollback if no payments were created
+                frappe.db.rollback()
 
         if not created_payments:
             # Check if all payments were credit (which is expected behavior - no payment entries needed)
@@ -2968,42 +2837,77 @@ def get_stock(item_code):
         return {"error": "Item code is required"}
 
     try:
-        current_user = frappe.session.user
-        target_warehouse = None
-
-        # Fetch the settings document
-        # Note: If 'HA POS Settings' is a 'Single' DocType, use frappe.get_single
-        pos_settings = frappe.get_doc("HA POS Settings")
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_user_mapping,
+        )
 
-        # Loop through the child table 'user_mapping'
-        for row in pos_settings.get("user_mapping"):
-            if row.user == current_user:
-                target_warehouse = row.warehouse
-                break 
-        
-        # --- THE PRINT SECTION ---
-        if target_warehouse:
-            print(f"🎯 Found Warehouse: {target_warehouse} for User: {current_user}")
-        else:
-            print(f"⚠️ No warehouse mapped for User: {current_user}")
-        # -------------------------
+        current_user = frappe.session.user
+        mapping = get_user_mapping(current_user)
+        target_warehouse = mapping.warehouse if mapping else None
 
         if not target_warehouse:
             return {
                 "error": f"No warehouse mapping found for {current_user}"
             }
 
-        # Get the actual quantity from the Bin
+        # Get the actual quantity from the Bin, less what open orders have reserved
+        from havano_restaurant_pos.reservations import get_reserved_qty
+
         qty = frappe.db.get_value(
             "Bin",
             {"item_code": item_code, "warehouse": target_warehouse},
             "actual_qty"
         ) or 0
+        reserved = get_reserved_qty(target_warehouse, [item_code]).get(item_code, 0)
 
         return {
             "item_code": item_code,
             "warehouse": target_warehouse,
-            "stock": qty
+            "stock": qty,
+            "reserved": reserved,
+            "projected": flt(qty) - reserved,
+        }
+
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "POS Stock check failed")
+        return {"error": str(e)}
+
+
+@frappe.whitelist()
+def get_stock_bulk(item_codes):
+    """
+    Stock of many items in the user's mapped warehouse, one Bin query.
+    Returns {"warehouse", "stock": {item_code: actual_qty}, "projected": {item_code: qty}};
+    items without a Bin get 0, projected is net of open-order reservations.
+    """
+    if isinstance(item_codes, str):
+        item_codes = frappe.parse_json(item_codes) if item_codes.startswith("[") else item_codes.split(",")
+    item_codes = list({code for code in (item_codes or []) if code})
+    if not item_codes:
+        return {"error": "Item codes are required"}
+
+    try:
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_user_mapping,
+        )
+
+        current_user = frappe.session.user
+        mapping = get_user_mapping(current_user)
+        target_warehouse = mapping.warehouse if mapping else None
+
+        if not target_warehouse:
+            return {
+                "error": f"No warehouse mapping found for {current_user}"
+            }
+
+        from havano_restaurant_pos.reservations import get_projected_stock
+
+        stock, projected = get_projected_stock(target_warehouse, item_codes)
+
+        return {
+            "warehouse": target_warehouse,
+            "stock": stock,
+            "projected": projected,
         }
 
     except Exception as e:
@@ -3040,72 +2944,44 @@ def add_remark(remark_text: str = None):
     return {"status": "success", "remark": doc.remark}
 
 def get_fullname_from_email(email):
-    if not email:
-        return None
+    from havano_restaurant_pos.receipt import get_user_full_name
 
-    return frappe.db.get_value("User", email, "full_name")
+    return get_user_full_name(email)
 
-def _build_invoice_json(invoice_doc, cost_center_doc=None):
+def _build_invoice_json(invoice_doc, cost_center_doc=None, item_flags=None):
     """
     Build invoice JSON from Sales Invoice doc. Optimized: batch item flags, minimal queries.
     cost_center_doc: optional dict from Cost Center Details (avoids lookup when provided).
+    item_flags: optional result of _get_item_order_flags_batch covering the invoice items.
+    The company / cost center part of the receipt comes from the receipt header cache.
     """
+    from havano_restaurant_pos.receipt import get_receipt_header
+
     company_name = invoice_doc.company
     if not cost_center_doc:
-        user = frappe.session.user
-        cost_center_name = frappe.db.get_value(
-            "Ha User Mapping",
-            {"parent": "HA POS Settings", "parenttype": "HA POS Settings", "user": user},
-            "cost_center",
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_user_mapping,
         )
+
+        mapping = get_user_mapping()
+        cost_center_name = mapping.cost_center if mapping else None
         if not cost_center_name:
             frappe.throw("No cost center mapped for current user in HA POS Settings")
-        cost_center_doc = frappe.db.get_value(
-            "Cost Center Details",
-            {"cost_center": cost_center_name},
-            ["email", "address_line_1", "address_line_2", "phone", "company_name"],
-            as_dict=True,
-        )
+        header = get_receipt_header(company_name, cost_center_name)
+        cost_center_doc = header["cost_center_doc"]
         if not cost_center_doc:
             frappe.throw(f"No Cost Center Details found for {cost_center_name}")
+    else:
+        header = get_receipt_header(company_name, None)
 
-    company_city = company_state = company_pincode = ""
-    company_fields = frappe.db.get_value(
-        "Company",
-        company_name,
-        ["company_name", "phone_no", "tax_id"],
-        as_dict=True,
-    ) or {}
-    addr_list = frappe.get_all(
-        "Address",
-        filters=[
-            ["Dynamic Link", "link_doctype", "=", "Company"],
-            ["Dynamic Link", "link_name", "=", company_name],
-            ["Address", "is_primary_address", "=", 1],
-        ],
-        fields=["address_line1", "address_line2", "city", "state", "pincode"],
-        limit=1,
-    )
-    if not addr_list:
-        addr_list = frappe.get_all(
-            "Address",
-            filters=[
-                ["Dynamic Link", "link_doctype", "=", "Company"],
-                ["Dynamic Link", "link_name", "=", company_name],
-            ],
-            fields=["address_line1", "address_line2", "city", "state", "pincode"],
-            limit=1,
-        )
-    addr = addr_list[0] if addr_list else None
-    if addr:
-        company_city = addr.get("city") or ""
-        company_state = addr.get("state") or ""
-        company_pincode = addr.get("pincode") or ""
-    else:
-        company_city = company_state = company_pincode = ""
+    company_fields = header["company"]
+    company_city = header["address"]["city"]
+    company_state = header["address"]["state"]
+    company_pincode = header["address"]["pincode"]
 
-    item_codes = [r.item_code for r in invoice_doc.items if r.item_code]
-    item_flags = _get_item_order_flags_batch(item_codes) if item_codes else {}
+    if item_flags is None:
+        item_codes = [r.item_code for r in invoice_doc.items if r.item_code]
+        item_flags = _get_item_order_flags_batch(item_codes) if item_codes else {}
 
     items = []
     for item in invoice_doc.items:
@@ -3196,25 +3072,119 @@ def download_invoice_json():
     frappe.local.response.filecontent = frappe.as_json(data)
     frappe.local.response.type = "download"
 
+RECEIPT_EXPORT_LIMIT = 5000
+RECEIPT_EXPORT_CHUNK = 200
+
+
+@frappe.whitelist()
+def download_invoices_json(invoice_names=None, from_date=None, to_date=None, shift=None, receipt_type=None):
+    """
+    Bulk receipt export for reprints and fiscal backfill, as newline-delimited JSON
+    (one get_invoice_json payload per line, oldest first).
+
+    Select invoices by a list of names, a posting date range and/or a shift
+    (Sales Invoice.custom_shift_number). Only submitted invoices are exported.
+    """
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import get_user_mapping
+    from havano_restaurant_pos.receipt import get_receipt_header, load_invoices
+
+    filters = {"docstatus": 1}
+    if invoice_names:
+        if isinstance(invoice_names, str):
+            invoice_names = frappe.parse_json(invoice_names) if invoice_names.startswith("[") else invoice_names.split(",")
+        filters["name"] = ["in", [name.strip() for name in invoice_names if name and name.strip()]]
+    if from_date and to_date:
+        filters["posting_date"] = ["between", [from_date, to_date]]
+    elif from_date:
+        filters["posting_date"] = [">=", from_date]
+    elif to_date:
+        filters["posting_date"] = ["<=", to_date]
+    if shift:
+        filters["custom_shift_number"] = shift
+    if len(filters) == 1:
+        frappe.throw("Pass invoice_names, a date range or a shift")
+
+    # permission-checked selection; the data itself is read in bulk below
+    names = frappe.get_list(
+        "Sales Invoice",
+        filters=filters,
+        pluck="name",
+        order_by="posting_date asc, creation asc",
+        limit_page_length=RECEIPT_EXPORT_LIMIT + 1,
+    )
+    if len(names) > RECEIPT_EXPORT_LIMIT:
+        frappe.throw(f"More than {RECEIPT_EXPORT_LIMIT} invoices selected, please narrow the range")
+
+    mapping = get_user_mapping()
+    cost_center_name = mapping.cost_center if mapping else None
+    if not cost_center_name:
+        frappe.throw("No cost center mapped for current user in HA POS Settings")
+
+    lines = []
+    for start in range(0, len(names), RECEIPT_EXPORT_CHUNK):
+        invoices = load_invoices(names[start:start + RECEIPT_EXPORT_CHUNK])
+        item_flags = _get_item_order_flags_batch(
+            {item.item_code for invoice in invoices for item in invoice.items if item.item_code}
+        )
+        for invoice in invoices:
+            cost_center_doc = get_receipt_header(invoice.company, cost_center_name)["cost_center_doc"]
+            if not cost_center_doc:
+                frappe.throw(f"No Cost Center Details found for {cost_center_name}")
+            data = _build_invoice_json(invoice, cost_center_doc=cost_center_doc, item_flags=item_flags)
+            data["ReceiptType"] = receipt_type
+            lines.append(frappe.as_json(data, indent=None))
+
+    frappe.local.response.filename = f"receipts-{frappe.utils.now_datetime().strftime('%Y%m%d%H%M%S')}.ndjson"
+    frappe.local.response.filecontent = "\n".join(lines) + ("\n" if lines else "")
+    frappe.local.response.type = "download"
+
+
+def _get_item_vat_rates(item_codes):
+    """
+    item_code -> VAT rate (maximum_net_rate) for items whose first Item Tax row
+    (by idx) has the "VAT" tax category. One query for all items.
+    """
+    if not item_codes:
+        return {}
+
+    first_rows = {}
+    for row in frappe.get_all(
+        "Item Tax",
+        filters={"parenttype": "Item", "parent": ["in", list(item_codes)]},
+        fields=["parent", "tax_category", "maximum_net_rate"],
+        order_by="parent asc, idx asc",
+    ):
+        first_rows.setdefault(row.parent, row)
+
+    return {
+        item_code: flt(row.maximum_net_rate)
+        for item_code, row in first_rows.items()
+        if row.tax_category == "VAT"
+    }
+
+
 @frappe.whitelist()
 def generate_quotation_json(quote_id):
+    from havano_restaurant_pos.receipt import get_user_full_name
+
     # --- Get Invoice ---
     quote = frappe.get_doc("Quotation", quote_id)
 
-    # --- Get Company Info ---
+    # --- Get Company Info (document cache, cleared by Frappe on save) ---
     company_name = frappe.db.get_single_value("Global Defaults", "default_company")
-    company = frappe.get_doc("Company", company_name)
-    currency = frappe.db.get_value("Company", company, "default_currency")
-    # --- Get Customer Info (custom doctype linked by customer name) ---
-    customer_doc = frappe.get_doc("Customer", quote.customer_name)
+    company = frappe.get_cached_doc("Company", company_name)
+    currency = company.default_currency
+    # --- Get Customer Info ---
+    customer_id = quote.party_name if quote.quotation_to == "Customer" else quote.customer_name
+    customer_doc = frappe.get_cached_doc("Customer", customer_id)
 
     # --- Get Logged-in User (Cashier) ---
-    cashier_name = frappe.db.get_value("User", frappe.session.user, "full_name")
+    cashier_name = get_user_full_name(frappe.session.user)
 
     # --- Get Invoice Items ---
     items = frappe.get_all(
         "Quotation Item",
-        filters={"parent": quote.name},
+        filters={"parent": quote.name, "parenttype": "Quotation"},
         fields=[
             "item_name as ProductName",
             "item_code as productid",
@@ -3222,44 +3192,19 @@ def generate_quotation_json(quote_id):
             "rate as Price",
             "amount as Amount",
         ],
+        order_by="idx asc",
     )
-    # print(items)
-    # , "vat as vat"
-    for item in items:
-        item_code = item.get("productid")
-        print(item_code)
-        # -------- Get Item Tax Category from Item Doctype -------
-        tax_category = frappe.db.get_value(
-            "Item Tax",
-            {"parent": item_code},  # filter by parent (item_code)
-            "tax_category",
-        )
-        tax_rate = 0
-        tax_amount = 0
-        print(tax_category)
-
-        # -------- If VAT category, fetch maximum_net_rate -------
-        if tax_category == "VAT":
-            # Fetch the Item Tax record for VAT
-            tax_info = frappe.get_all(
-                "Item Tax", filters={"parent": item_code}, fields=["maximum_net_rate"]
-            )
-            if tax_info:
-                tax_rate = tax_info[0].maximum_net_rate or 0
-
-            # -------- Calculate tax amount --------
-            tax_amount = (tax_rate / 100) * item.get("Amount", 0)
-            tax_amount = float(f"{tax_amount:.2f}")
 
-        # Add new fields to item
+    # -------- VAT rate per item: first Item Tax row of each item, one query --------
+    vat_rates = _get_item_vat_rates({item.get("productid") for item in items if item.get("productid")})
+    for item in items:
+        tax_rate = vat_rates.get(item.get("productid"), 0)
         item["tax_rate"] = tax_rate
-        item["tax_amount"] = tax_amount
+        item["tax_amount"] = float(f"{(tax_rate / 100) * flt(item.get('Amount')):.2f}") if tax_rate else 0
 
     # --- Build JSON Data ---
-    date_str = str(quote.creation)
-    dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S.%f")
     # Format to yyyy-MM-dd
-    formatted_date = dt.strftime("%Y-%m-%d")
+    formatted_date = frappe.utils.getdate(quote.creation).strftime("%Y-%m-%d")
     data = {
         "doc_type": "Quote",
         "CompanyName": company.company_name,
@@ -3461,12 +3406,12 @@ def is_payment_method_credit(payment_method):
     if not payment_method:
         return False
     try:
-        settings = frappe.get_single("HA POS Settings")
-        if settings.selected_payment_methods:
-            for method in settings.selected_payment_methods:
-                if method.mode_of_payment == payment_method:
-                    return bool(method.is_credit)
-        return False
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_payment_method,
+        )
+
+        method = get_payment_method(payment_method)
+        return bool(method and method.is_credit)
     except Exception as e:
         frappe.log_error(f"Error checking payment method credit status: {str(e)}")
         # Return False on error to ensure normal flow continues
@@ -3495,6 +3440,14 @@ def process_multi_currency_payment_background(customer, payments):
     This runs asynchronously in the queue.
     IMPORTANT: This function must be callable from frappe.enqueue.
     """
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_pos_setting,
+    )
+    from havano_restaurant_pos.payment_routing import (
+        get_payment_route,
+        make_tender_journal_entries,
+    )
+
     frappe.set_user("Administrator")  # Ensure proper permissions in background job
     try:
         # Parse JSON if payments is a string
@@ -3646,6 +3599,10 @@ def process_multi_currency_payment_background(customer, payments):
                 "details": "Payments dictionary is empty. Please provide at least one payment method with amount > 0.",
             }
 
+        # Consolidated mode: the tenders post as one Journal Entry per currency after the loop
+        consolidate = bool(get_pos_setting("consolidate_split_payments")) and len(payments) > 1
+        journal_tenders = []
+
         try:
             payments_items = payments.items()
         except (AttributeError, TypeError) as e:
@@ -3675,78 +3632,20 @@ def process_multi_currency_payment_background(customer, payments):
             if paid_amount <= 0:
                 continue
 
-            # Check if payment method is credit - skip payment entry creation for credit methods
-            try:
-                is_credit = is_payment_method_credit(method)
-            except Exception as credit_check_error:
-                frappe.log_error(f"Error checking credit status for {method}: {str(credit_check_error)}", "Credit Check Error")
-                is_credit = False
+            # Account, currency, type, credit and bank flags for this tender (no queries)
+            route = get_payment_route(company, method)
             
-            if is_credit:
+            if route.is_credit:
                 # For credit methods, skip payment entry creation
                 credit_payments_total += paid_amount
                 credit_payments_count += 1
                 continue
 
             original_method = method
-            
-            mode_exists = frappe.db.exists("Mode of Payment", method) if method else False
-            
-            if not mode_exists and method and method != "Cash":
-                try:
-                    new_mode = frappe.new_doc("Mode of Payment")
-                    new_mode.mode_of_payment = method
-                    new_mode.type = "Cash"
-                    new_mode.insert(ignore_permissions=True)
-                    frappe.db.commit()
-                    mode_exists = True
-                    frappe.log_error(
-                        f"Created new Mode of Payment '{method}' automatically",
-                        "Mode of Payment Auto-Created"
-                    )
-                except Exception as create_error:
-                    frappe.log_error(
-                        f"Mode of Payment '{method}' does not exist and could not be created: {str(create_error)}. Will use ignore_links to bypass validation.",
-                        "Mode of Payment Creation Failed"
-                    )
-            
-            mode_account = None
-            if method and method != "Cash":
-                mode_accounts = frappe.get_all(
-                    "Mode of Payment Account",
-                    filters={"parent": method, "company": company},
-                    fields=["default_account"],
-                    limit=1
-                )
-                if mode_accounts and mode_accounts[0].default_account:
-                    mode_account = mode_accounts[0].default_account
-            
-            if not mode_account:
-                mode_account = paid_to_account
-
-            mode_account_currency = frappe.get_cached_value("Account", mode_account, "account_currency") or company_currency
-            
-            # Get mode of payment type to check if it's Bank (requires reference_no and reference_date)
-            # Check mode type more reliably - try to get it even if mode_exists check failed
-            mode_type = None
-            if original_method:
-                try:
-                    # Try to get mode type directly from database
-                    mode_type = frappe.get_cached_value("Mode of Payment", original_method, "type")
-                except Exception:
-                    # If cached value fails, try direct query
-                    try:
-                        mode_doc = frappe.get_doc("Mode of Payment", original_method)
-                        mode_type = mode_doc.type if hasattr(mode_doc, 'type') else None
-                    except Exception:
-                        mode_type = None
-            
-            # Also check if the account type is Bank
-            account_type = None
-            try:
-                account_type = frappe.get_cached_value("Account", mode_account, "account_type")
-            except Exception:
-                pass
+            mode_account = route.account
+            mode_account_currency = route.currency
+            mode_type = route.mode_type
+            account_type = route.account_type
             
             source_exchange_rate = 1.0
             target_exchange_rate = 1.0
@@ -3756,7 +3655,7 @@ def process_multi_currency_payment_background(customer, payments):
 
             if paid_from_currency != mode_account_currency:
                 try:
-                    from erpnext.setup.utils import get_exchange_rate
+                    from havano_restaurant_pos.exchange_rates import get_exchange_rate
                     target_exchange_rate = get_exchange_rate(
                         mode_account_currency, paid_from_currency, frappe.utils.nowdate()
                     )
@@ -3765,6 +3664,19 @@ def process_multi_currency_payment_background(customer, payments):
                     target_exchange_rate = 1.0
                     paid_amount_in_company_currency = paid_amount
 
+            if consolidate:
+                journal_tenders.append(
+                    {
+                        "mode_of_payment": original_method,
+                        "account": mode_account,
+                        "currency": mode_account_currency,
+                        "amount": received_amount,
+                        "base_amount": paid_amount_in_company_currency,
+                        "is_bank": route.is_bank,
+                    }
+                )
+                continue
+
             try:
                 payment_entry = frappe.new_doc("Payment Entry")
                 payment_entry.payment_type = "Receive"
@@ -3870,6 +3782,23 @@ def process_multi_currency_payment_background(customer, payments):
                 )
                 continue
 
+        if journal_tenders:
+            try:
+                created_payments.extend(
+                    make_tender_journal_entries(
+                        company,
+                        customer,
+                        journal_tenders,
+                        paid_from_account,
+                        paid_from_currency,
+                        remark="Multi-currency payment",
+                    )
+                )
+            except Exception as e:
+                error_msg = f"Failed to create journal entry for the multi-currency payment: {e!s}"
+                error_messages.append(error_msg)
+                frappe.log_error(f"{error_msg}\nTraceback: {frappe.get_traceback()}", "Payment Entry Error")
+
         if created_payments:
             frappe.db.commit()
         else:
@@ -4351,7 +4280,7 @@ def make_multi_currency_payment(customer, payments):
             # Convert payment amount to company currency for paid_amount field (currency converted amount)
             if paid_from_currency != mode_account_currency:
                 try:
-                    from erpnext.setup.utils import get_exchange_rate
+                    from havano_restaurant_pos.exchange_rates import get_exchange_rate
                     # Get rate FROM payment currency TO company currency
                     target_exchange_rate = get_exchange_rate(
                         mode_account_currency, paid_from_currency, frappe.utils.nowdate()
@@ -4540,55 +4469,153 @@ def make_multi_currency_payment(customer, payments):
             "message": "Failed to make multi-currency payment",
             "details": f"{error_type}: {error_msg}",
         }
+def _get_menu_user_context():
+    """Return (price_list, cost_center, item_view_per_cost_center) for the session user."""
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_pos_setting,
+        get_user_mapping,
+    )
+
+    use_cost_center = get_pos_setting("item_view_per_cost_center")  # ✅ toggle
+    mapping = get_user_mapping()
+    if not mapping:
+        return None, None, use_cost_center
+
+    return mapping.price_list, mapping.cost_center, use_cost_center
+
+
 @frappe.whitelist()
 def get_menu_items_with_user_prices():
-    user = frappe.session.user
-    print("\n👤 Logged in user:", user)
+    from havano_restaurant_pos.catalog import get_catalog_snapshot
+
+    user_price_list, user_cost_center, use_cost_center = _get_menu_user_context()
+
+    return get_catalog_snapshot(
+        user_price_list,
+        user_cost_center,
+        use_cost_center,
+        lambda: _build_menu_items(user_price_list, user_cost_center, use_cost_center),
+    )
+
+
+# Rows committed shortly before the previous sync may carry an older `modified`,
+# so every delta re-reads a small window before `since` (upserts are idempotent)
+MENU_SYNC_OVERLAP_SECONDS = 60
+
 
-    settings = frappe.get_single("HA POS Settings")
+@frappe.whitelist()
+def get_menu_items_delta(since=None, version=None):
+    """
+    Return only the menu items that changed since the client's last sync.
+
+    Args:
+        since: `server_time` returned by the previous call (omit for a full load)
+        version: `version` returned by the previous call
+
+    Returns:
+        dict: {version, server_time, full, upserts, removed}
+              `full` means `upserts` is the whole catalog and replaces the client copy.
+    """
+    from frappe.utils import add_to_date, get_datetime, now
+    from havano_restaurant_pos.catalog import get_catalog_snapshot, get_catalog_version
+
+    server_time = now()
+    current_version = get_catalog_version()
+    user_price_list, user_cost_center, use_cost_center = _get_menu_user_context()
+
+    response = {
+        "version": current_version,
+        "server_time": server_time,
+        "full": False,
+        "upserts": [],
+        "removed": [],
+    }
+
+    if since and version and version == current_version:
+        # Nothing in the catalog changed since the last sync
+        response["server_time"] = since
+        return response
+
+    settings_modified = frappe.db.get_value("HA POS Settings", "HA POS Settings", "modified")
+    if not since or (settings_modified and get_datetime(settings_modified) > get_datetime(since)):
+        # First load, or the user's price list / cost center mapping may have changed
+        response["full"] = True
+        response["upserts"] = get_catalog_snapshot(
+            user_price_list,
+            user_cost_center,
+            use_cost_center,
+            lambda: _build_menu_items(user_price_list, user_cost_center, use_cost_center),
+        )
+        return response
+
+    since = add_to_date(get_datetime(since), seconds=-MENU_SYNC_OVERLAP_SECONDS)
 
-    user_price_list = None
-    user_cost_center = None
-    use_cost_center = settings.item_view_per_cost_center  # ✅ toggle
+    changed = set(frappe.get_all("Item", filters={"modified": [">=", since]}, pluck="name"))
+    changed.update(
+        frappe.get_all("Item Barcode", filters={"modified": [">=", since]}, pluck="parent")
+    )
+    if user_price_list:
+        changed.update(
+            frappe.get_all(
+                "Item Price",
+                filters={"price_list": user_price_list, "modified": [">=", since]},
+                pluck="item_code",
+            )
+        )
+
+    deleted_items = set()
+    deleted_rows = frappe.get_all(
+        "Deleted Document",
+        filters={"deleted_doctype": ["in", ["Item", "Item Price"]], "creation": [">=", since]},
+        fields=["deleted_doctype", "deleted_name", "data"],
+    )
+    for row in deleted_rows:
+        if row.deleted_doctype == "Item":
+            deleted_items.add(row.deleted_name)
+            continue
+        try:
+            data = frappe.parse_json(row.data) or {}
+        except Exception:
+            continue
+        if data.get("price_list") == user_price_list and data.get("item_code"):
+            changed.add(data.get("item_code"))
+
+    changed -= deleted_items
+    if changed:
+        response["upserts"] = _build_menu_items(
+            user_price_list, user_cost_center, use_cost_center, item_codes=list(changed)
+        )
 
-    # 🔍 get user's price list + cost center
-    for row in settings.user_mapping:
-        if row.user == user:
-            user_price_list = row.price_list
-            user_cost_center = row.cost_center
-            break
+    # Items that changed but no longer qualify (disabled, hidden, unlinked from the cost center)
+    still_visible = {item["name"] for item in response["upserts"]}
+    response["removed"] = sorted(deleted_items | (changed - still_visible))
 
-    print("💰 User Price List:", user_price_list)
-    print("🏢 User Cost Center:", user_cost_center)
-    print("⚙️ Use Cost Center Filter:", use_cost_center)
+    return response
 
-    # 🚫 hidden item groups
-    hidden_groups = set(frappe.get_all(
-        "Item Group",
-        filters={"custom_do_not_show_in_pos": 1},
-        pluck="name"
-    ) or [])
 
-    print("🚫 Hidden Item Groups:", hidden_groups)
+def _build_menu_items(user_price_list, user_cost_center, use_cost_center, item_codes=None):
+    """
+    Build the POS menu catalog for a (price list, cost center, cost center view) combination.
+    `item_codes` restricts the build to those items (used by the delta sync).
+    """
+    from havano_restaurant_pos.catalog import (
+        attach_prices_and_barcodes,
+        index_item_barcodes,
+        index_item_prices,
+    )
 
     # 🧠 STEP 1: get items based on cost center (ONLY if enabled)
     item_names = []
 
     if use_cost_center:
-        print("🔒 Cost center filtering ENABLED")
-
-        if user_cost_center:
-            item_names = frappe.get_all(
-                "item_costcenters",
-                filters={"cost_center": user_cost_center},
-                pluck="parent"
-            )
-            print("📦 Items linked to cost center:", item_names)
-        else:
-            print("⚠️ No cost center for user. Returning empty list.")
+        if not user_cost_center:
             return []
-    else:
-        print("🚀 Cost center filtering DISABLED (show all items)")
+
+        item_names = frappe.get_all(
+            "item_costcenters",
+            filters={"cost_center": user_cost_center},
+            pluck="parent"
+        )
 
     # 🧠 STEP 2: build filters
     filters = {
@@ -4602,10 +4629,14 @@ def get_menu_items_with_user_prices():
         if item_names:
             filters["name"] = ["in", item_names]
         else:
-            print("⚠️ No items found for this cost center. Returning empty list.")
             return []
 
-    print("🔎 Final Item Filters:", filters)
+    if item_codes is not None:
+        if use_cost_center:
+            item_codes = list(set(item_codes) & set(item_names))
+        if not item_codes:
+            return []
+        filters["name"] = ["in", item_codes]
 
     # 📦 fetch items
     items = frappe.get_all(
@@ -4621,53 +4652,29 @@ def get_menu_items_with_user_prices():
         ]
     )
 
-    print(f"📊 Items fetched before group filtering: {len(items)}")
-
-    # (optional) hidden group filtering
-    # items = [i for i in items if (i.get("item_group") or "") not in hidden_groups]
-
-    print(f"📊 Items after hidden group filter: {len(items)}")
-
     # 💰 prices
-    item_prices = {}
+    price_data = []
     if user_price_list:
+        price_filters = {"price_list": user_price_list}
+        if item_codes is not None:
+            price_filters["item_code"] = ["in", item_codes]
+
         price_data = frappe.get_all(
             "Item Price",
-            filters={"price_list": user_price_list},
+            filters=price_filters,
             fields=["item_code", "price_list_rate", "uom"]
         )
 
-        for p in price_data:
-            if p.item_code == "testing 3":
-                print(p)
-            item_prices[(p.item_code, p.uom)] = p.price_list_rate
-
-    print("💵 Item price map size:", len(item_prices))
-
     # 🏷️ barcodes
     item_codes = [i["name"] for i in items]
     barcode_rows = frappe.get_all(
         "Item Barcode",
         filters={"parent": ["in", item_codes]},
         fields=["parent", "barcode"]
-    )
-
-    barcodes_by_item = {}
-    for row in barcode_rows:
-        barcodes_by_item.setdefault(row["parent"], []).append(row.get("barcode") or "")
-
-    print("🏷️ Barcode entries fetched:", len(barcode_rows))
+    ) if item_codes else []
 
     # 🔗 attach price + barcodes
-    for item in items:
-        item["prices_by_uom"] = {
-        uom: price
-        for (code, uom), price in item_prices.items()
-        if code == item["name"]
-    }
-        item["barcodes"] = barcodes_by_item.get(item["name"], [])
-
-    print("✅ Final items ready:", len(items))
+    attach_prices_and_barcodes(items, index_item_prices(price_data), index_item_barcodes(barcode_rows))
 
     return items
 
@@ -4850,47 +4857,42 @@ def create_invoice_and_payment_queue(payload=None, **kwargs):
                 "details": str(inv_error),
             }
 
+        # 2. Record submit + payment + HA order as a durable checkout job in the same
+        # transaction as the draft invoice, so a dead worker can never lose the sale
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_checkout_job.ha_pos_checkout_job import (
+            create_checkout_job,
+            enqueue_checkout_job,
+        )
+
+        checkout_job = create_checkout_job(
+            invoice_name,
+            {
+                "payment_breakdown": payment_breakdown,
+                "payment_method": payment_method,
+                "amount": amount,
+                "note": note,
+                "order_payload": order_payload,
+                "multi_currency_payments": multi_currency_payments,
+            },
+        )
+
+        # Kitchen tickets go out with the commit, not after the background submit
+        from havano_restaurant_pos.kds import queue_invoice_tickets
+
+        queue_invoice_tickets(invoice_name, order_payload)
+
         # Commit invoice immediately so it's visible for download
         frappe.db.commit()
 
-        # 2. Run submit + payment + HA order in background thread (return immediately)
-        # Always use thread so process_payment_entries runs even without queue worker
-        import threading
-        import copy
-        _site = frappe.local.site
-        _invoice_name = invoice_name
-        _payment_breakdown = copy.deepcopy(payment_breakdown) if payment_breakdown else None
-        _payment_method = payment_method
-        _amount = amount
-        _note = note
-        _order_payload = copy.deepcopy(order_payload) if order_payload else None
-        _multi_currency_payments = copy.deepcopy(multi_currency_payments) if multi_currency_payments else None
-
-        def run_process_payment_entries():
-            try:
-                frappe.connect(site=_site)
-                process_payment_entries(
-                    _invoice_name,
-                    _payment_breakdown,
-                    _payment_method,
-                    _amount,
-                    _note,
-                    _order_payload,
-                    _multi_currency_payments,
-                )
-                frappe.db.commit()
-            except Exception:
-                frappe.log_error(frappe.get_traceback(), "Process Payment Entries (Background Thread)")
-            finally:
-                frappe.destroy()
-
-        t = threading.Thread(target=run_process_payment_entries, daemon=True)
-        t.start()
+        # 3. Process it on the bounded checkout pool (return immediately); the scheduler
+        # drains anything the pool could not finish, with retries and backoff
+        enqueue_checkout_job(checkout_job)
 
         return {
             "success": True,
             "message": "Sales invoice created. Submit and payment processing in background.",
             "sales_invoice": invoice_name,
+            "checkout_job": checkout_job,
         }
         
     except Exception as e:
@@ -4902,6 +4904,58 @@ def create_invoice_and_payment_queue(payload=None, **kwargs):
         }
 
 
+@frappe.whitelist()
+def get_checkout_status(sales_invoice):
+    """Status of the background submit/payment job for a POS sales invoice."""
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_checkout_job.ha_pos_checkout_job import (
+        get_checkout_status as _get_checkout_status,
+    )
+
+    status = _get_checkout_status(sales_invoice)
+    if not status:
+        return {"success": False, "message": f"No checkout job found for {sales_invoice}"}
+
+    return {"success": True, "data": status}
+
+
+@frappe.whitelist()
+def get_kds_tickets(station, include_bumped=0):
+    """Open kitchen tickets for a KDS station (1-6, from the Item custom_is_order_item flags)."""
+    from havano_restaurant_pos.kds import get_tickets
+
+    return get_tickets(station, include_bumped=cint(include_bumped))
+
+
+@frappe.whitelist()
+def bump_kds_ticket(station, ticket_id):
+    """Mark a kitchen ticket as done on its station."""
+    from havano_restaurant_pos.kds import bump_ticket
+
+    ticket = bump_ticket(station, ticket_id)
+    if not ticket:
+        return {"success": False, "message": f"Ticket {ticket_id} is not open on station {station}"}
+    return {"success": True, "ticket": ticket}
+
+
+@frappe.whitelist()
+def recall_kds_ticket(station, ticket_id):
+    """Bring a bumped kitchen ticket back to its station."""
+    from havano_restaurant_pos.kds import recall_ticket
+
+    ticket = recall_ticket(station, ticket_id)
+    if not ticket:
+        return {"success": False, "message": f"Ticket {ticket_id} was not bumped on station {station}"}
+    return {"success": True, "ticket": ticket}
+
+
+@frappe.whitelist()
+def get_checkout_worker_stats():
+    """Post-checkout pool metrics for this web worker: queue depth, in-flight, latency."""
+    from havano_restaurant_pos.checkout_worker import get_pool
+
+    return get_pool().stats()
+
+
 def process_payment_entries(
     invoice_name,
     payment_breakdown=None,
@@ -5172,8 +5226,9 @@ def process_payment_entries(
                 frappe.log_error(f"Error creating HA Order: {str(e)}\n{frappe.get_traceback()}", "Process Payment Entries Order Error")
                 order_id = None
         
-        # Commit all changes
-        frappe.db.commit()
+        # Commit all changes (batch checkout commits once for the whole batch)
+        if not frappe.flags.get("in_checkout_batch"):
+            frappe.db.commit()
         
         # Log success for monitoring
         frappe.logger().info(f"Successfully processed payment entries for invoice {invoice_name}")
@@ -5187,6 +5242,9 @@ def process_payment_entries(
         }
         
     except Exception as e:
+        if frappe.flags.get("in_checkout_batch"):
+            # let the batch roll this invoice back to its savepoint
+            raise
         frappe.db.rollback()
         error_traceback = frappe.get_traceback()
         error_msg = f"Error in process_payment_entries: {str(e)}\n{error_traceback}"
@@ -5421,30 +5479,26 @@ def is_user_mapped():
     """
     Returns True if the logged-in user exists in HA POS Settings -> user_mapping
     """
-    user = frappe.session.user
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_user_mapping,
+    )
 
-    # Get HA POS Settings (assuming single)
     try:
-        settings = frappe.get_single("HA POS Settings")
+        return bool(get_user_mapping())
     except frappe.DoesNotExistError:
         return False  # no settings at all
 
-    # Check the child table
-    for row in settings.user_mapping:
-        # Make sure row.user is a string
-        if isinstance(row.user, str) and row.user == user:
-            return True
-
-    return False
-
 @frappe.whitelist()
 def can_use_negative_stock():
     """
     Returns True if HA POS Settings -> allow_negative_stock is checked
     """
     try:
-        settings = frappe.get_single("HA POS Settings")
-        return bool(settings.allow_negative_stock)
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_pos_setting,
+        )
+
+        return bool(get_pos_setting("allow_negative_stock"))
     except Exception as e:
         frappe.log_error("Can Use Negative Stock Error", f"Error checking allow_negative_stock: {str(e)}\n{frappe.get_traceback()}")
         return False
@@ -5456,45 +5510,22 @@ def save_payments_to_shift(cleaned_payments):
     """
     Save multi-currency payments to the open HA Shift POS for the current user.
     Uses the keys from cleaned_payments (e.g., Cash_USD) as the 'payment_method' in the child table.
-    If the key already exists in shift_amounts, it increments the amount instead of adding a new row.
+    If the key already exists in shift_amounts, it increments the amount instead of adding a new row
+    (atomically, see havano_restaurant_pos.shift).
     """
     user = frappe.session.user
     if not user:
         frappe.throw("No logged-in user found.")
 
-    # Get the most recent open shift for the logged-in user
-    shift = frappe.get_all(
-        "HA Shift POS",
-        filters={"user": user, "status": "Open"},
-        fields=["name"],
-        limit_page_length=1,
-        order_by="creation desc"
-    )
+    from havano_restaurant_pos.shift import add_shift_amounts, get_open_shift
 
+    # Get the most recent open shift for the logged-in user
+    shift = get_open_shift(user)
     if not shift:
         frappe.throw(f"No open shift found for user {user}.")
 
-    shift_doc = frappe.get_doc("HA Shift POS", shift[0].name)
-
-    for key, payment in cleaned_payments.items():
-        # Check if this key already exists in the child table
-        existing_row = next(
-            (row for row in shift_doc.shift_amounts if row.payment_method == key),
-            None
-        )
-
-        if existing_row:
-            # Increment existing amount
-            existing_row.amount += payment["amount"]
-        else:
-            # Append new row with the key as payment_method
-            shift_doc.append("shift_amounts", {
-                "payment_method": key,  # e.g., Cash_USD
-                "currency": payment["currency"],  # still store currency for reference
-                "amount": payment["amount"]
-            })
-
-    shift_doc.save()
+    cleaned_payments = frappe.parse_json(cleaned_payments)
+    add_shift_amounts(shift, {key: payment["amount"] for key, payment in cleaned_payments.items()})
     frappe.db.commit()
     frappe.msgprint("Payments saved to shift successfully!")
 
@@ -5511,21 +5542,10 @@ def get_user_shift_payments(user=None):
     if not user:
         frappe.throw("No logged-in user found.")
     
-    # Get all open shifts for this user
-    shifts = frappe.get_all(
-        "HA Shift POS",
-        filters={"user": user, "status": "Open"},
-        fields=["name"]
-    )
+    from havano_restaurant_pos.shift import get_shift_totals
 
-    payments_dict = {}
-    for shift in shifts:
-        shift_doc = frappe.get_doc("HA Shift POS", shift.name)
-        for row in getattr(shift_doc, "shift_amounts", []):
-            key = row.payment_method  # only payment_method now
-            payments_dict[key] = payments_dict.get(key, 0) + flt(row.amount)
-    print(f"payment methods-------------{payments_dict}")
-    return payments_dict
+    # Totals over all open shifts of this user, summed in one query
+    return get_shift_totals(user)
 
 @frappe.whitelist()
 def update_my_shift_payments(payment_data):
@@ -5736,14 +5756,12 @@ import frappe
 @frappe.whitelist(allow_guest=True)
 def validate_override_user(password):
     try:
-        # Fetch your HA POS Settings (assuming there’s only one)
-        settings = frappe.get_doc("HA POS Settings")
-        
-        # Loop through the child table
-        for mapping in settings.user_mapping:
-            # Replace 'password_fieldname' with the exact fieldname in your child table
+        from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+            get_user_mappings,
+        )
+
+        for mapping in get_user_mappings():
             if mapping.password == password:
-                print(f"Override user {mapping.user} authorized with provided password.")
                 return {"authorized": True, "username": mapping.user}
         
         # No match
@@ -5778,6 +5796,12 @@ def ensure_role(role_name):
         frappe.db.commit()
         print(f"✅ Created role: {role_name}")
 import requests
+
+# etag of the last user list synced from the cloud (see get_all_users)
+CLOUD_USERS_ETAG_KEY = "havano_pos:cloud_users_etag"
+# header carrying HA POS Settings.user_sync_token from branch terminals to the cloud
+USER_SYNC_TOKEN_HEADER = "X-Havano-Sync-Token"
+
 @frappe.whitelist(allow_guest=True)
 def sync_users_from_cloud():
     """
@@ -5794,11 +5818,21 @@ def sync_users_from_cloud():
         endpoint = f"{cloud_url}/api/method/havano_restaurant_pos.api.get_all_users"
         print(f"🔹 Fetching users from endpoint: {endpoint}")
 
-        resp = requests.get(endpoint, timeout=10)
+        # The cloud answers "not_modified" when the users are unchanged since the last sync
+        etag = frappe.cache().get_value(CLOUD_USERS_ETAG_KEY)
+        headers = {}
+        sync_token = _get_user_sync_token()
+        if sync_token:
+            headers[USER_SYNC_TOKEN_HEADER] = sync_token
+        resp = requests.get(endpoint, params={"etag": etag} if etag else None, headers=headers, timeout=10)
         resp.raise_for_status()
 
         cloud_json = resp.json()
         print(f"🔹 Cloud response keys: {list(cloud_json.keys())}")
+        payload = cloud_json.get("message") if isinstance(cloud_json.get("message"), dict) else {}
+        if payload.get("not_modified"):
+            print("🔹 Users unchanged on cloud, nothing to sync.")
+            return
         users = cloud_json.get("users") or cloud_json.get("data") or cloud_json.get("message", {}).get("users", [])
         print(f"🔹 Number of users received: {len(users)}")
         if not users:
@@ -5828,14 +5862,18 @@ def sync_users_from_cloud():
 
             # --- Assign roles ---
             user_doc = frappe.get_doc("User", email)
-            for role in roles:
+            existing_roles = {r.role for r in user_doc.roles}
+            missing_roles = [role for role in dict.fromkeys(roles) if role not in existing_roles]
+            for role in missing_roles:
                 ensure_role(role)
-                if role not in [r.role for r in user_doc.roles]:
-                    user_doc.append("roles", {"role": role})
-            user_doc.save(ignore_permissions=True)
-            print(f"✅ Roles updated for user {email}")
+                user_doc.append("roles", {"role": role})
+            if missing_roles:
+                user_doc.save(ignore_permissions=True)
+                print(f"✅ Roles updated for user {email}")
 
         frappe.db.commit()
+        if payload.get("etag"):
+            frappe.cache().set_value(CLOUD_USERS_ETAG_KEY, payload["etag"])
         frappe.msgprint(f"Synced {len(users)} users with roles from cloud")
         print("🎉 User sync completed successfully!")
 
@@ -6031,34 +6069,115 @@ def sync_cloud_settings():
 import frappe
 from frappe import _
 
-@frappe.whitelist(allow_guest=True)  # public endpoint
-def get_all_users():
+def _get_users_version():
+    """
+    (etag, last modified) of the synced user set, from two aggregate queries.
+    Role changes save the parent User, deleted rows change the counts.
+    """
+    import hashlib
+
+    user_modified, enabled_count = frappe.db.sql(
+        """
+        select max(modified), sum(enabled)
+        from `tabUser`
+        where name != 'Administrator'
+        """
+    )[0]
+    role_modified, role_count = frappe.db.sql(
+        """
+        select max(modified), count(*)
+        from `tabHas Role`
+        where parenttype = 'User'
+        """
+    )[0]
+
+    last_modified = max(filter(None, [user_modified, role_modified]), default=None)
+    version = f"{user_modified}|{enabled_count}|{role_modified}|{role_count}"
+    return hashlib.md5(version.encode()).hexdigest(), last_modified
+
+
+def _get_user_sync_token():
+    from frappe.utils.password import get_decrypted_password
+
+    return get_decrypted_password(
+        "HA POS Settings", "HA POS Settings", "user_sync_token", raise_exception=False
+    )
+
+
+def _check_user_sync_token():
+    """Allow System Managers, or callers sending the configured user sync token."""
+    import hmac
+
+    if frappe.session.user != "Guest" and "System Manager" in frappe.get_roles():
+        return
+
+    expected = _get_user_sync_token()
+    provided = frappe.get_request_header(USER_SYNC_TOKEN_HEADER) or ""
+    if not expected or not hmac.compare_digest(provided.encode(), expected.encode()):
+        frappe.throw(_("Invalid or missing user sync token"), frappe.AuthenticationError)
+
+
+@frappe.whitelist(allow_guest=True)  # branch terminals call it without a session, see _check_user_sync_token
+def get_all_users(etag=None, modified_since=None):
+    """
+    Enabled users (except Administrator) with their roles, in two queries.
+
+    Returns {"users", "etag", "modified"}. When `etag` matches the current one, or nothing
+    changed after `modified_since`, returns {"not_modified": True, "etag", "modified"} instead;
+    with `modified_since` only users changed after it are listed.
+
+    Callers must send HA POS Settings.user_sync_token in the X-Havano-Sync-Token header
+    (or be a logged-in System Manager).
+    """
+    from frappe.utils import get_datetime
+
+    _check_user_sync_token()
+
     try:
-        # get all enabled users except Administrator
-        users = frappe.get_all(
-            "User",
-            filters={"enabled": 1, "name": ["!=", "Administrator"]},
-            fields=["name", "email", "first_name"]
-        )
+        current_etag, last_modified = _get_users_version()
+        last_modified_str = str(last_modified) if last_modified else None
 
-        result = []
-        for u in users:
-            # get roles for this user
-            roles = frappe.get_all(
+        if (etag and etag == current_etag) or (
+            modified_since and last_modified and get_datetime(last_modified) <= get_datetime(modified_since)
+        ):
+            return {"not_modified": True, "etag": current_etag, "modified": last_modified_str}
+
+        filters = {"enabled": 1, "name": ["!=", "Administrator"]}
+        if modified_since:
+            changed_by_roles = frappe.get_all(
                 "Has Role",
-                filters={"parent": u.name},
-                fields=["role"]
+                filters={"parenttype": "User", "modified": [">", modified_since]},
+                pluck="parent",
+                distinct=True,
             )
-            role_list = [r.role for r in roles]
+            or_filters = {"modified": [">", modified_since]}
+            if changed_by_roles:
+                or_filters["name"] = ["in", changed_by_roles]
+            users = frappe.get_all("User", filters=filters, or_filters=or_filters, fields=["name", "email", "first_name"])
+        else:
+            users = frappe.get_all("User", filters=filters, fields=["name", "email", "first_name"])
 
-            result.append({
+        roles_by_user = {}
+        if users:
+            for row in frappe.get_all(
+                "Has Role",
+                filters={"parenttype": "User", "parent": ["in", [u.name for u in users]]},
+                fields=["parent", "role"],
+                order_by="parent asc, idx asc",
+            ):
+                roles_by_user.setdefault(row.parent, []).append(row.role)
+
+        result = [
+            {
                 "name": u.name,
                 "email": u.email,
                 "first_name": u.first_name,
-                "roles": role_list
-            })
+                "roles": roles_by_user.get(u.name, [])
+            }
+            for u in users
+        ]
 
-        return {"users": result}
+        return {"users": result, "etag": current_etag, "modified": last_modified_str}
 
     except Exception as e:
         frappe.log_error(message=str(e), title="Public User Sync")
@@ -6121,65 +6240,37 @@ def get_last_invoice_metrics():
 
 @frappe.whitelist()
 def get_user_uom_config():
-    print("\n🔥 === get_user_uom_config CALLED ===")
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_pos_setting,
+        get_user_mapping_rows,
+    )
 
     try:
-        settings = frappe.get_single("HA POS Settings")
-        print("✅ Loaded HA POS Settings")
-
-        print(f"👉 user_specific_uoms: {settings.user_specific_uoms}")
-
         # If feature OFF → allow everything
-        if not settings.user_specific_uoms:
-            print("⚠️ Feature disabled → returning unrestricted config")
-
+        if not get_pos_setting("user_specific_uoms"):
             return {
                 "enabled": False,
                 "uoms": []
             }
 
-        current_user = frappe.session.user
-        print(f"👤 Current user: {current_user}")
-
         allowed_uoms = []
 
-        print("📦 Looping through user_mapping...")
-
-        for row in settings.user_mapping:
-            print(f"➡️ Row user: {row.user}")
-
-            if row.user == current_user:
-                print("   ✅ Match found for current user")
-
-                # adjust field name if needed
-                if hasattr(row, "allowed_uom") and row.allowed_uom:
-                    print(f"   📌 Found UOM: {row.allowed_uom}")
-                    allowed_uoms.append(row.allowed_uom)
-
-                elif hasattr(row, "allowed_uoms") and row.allowed_uoms:
-                    allowed_uoms.append(row.allowed_uoms)
-
-                else:
-                    print("   ⚠️ No UOM field found on this row")
+        for row in get_user_mapping_rows():
+            # adjust field name if needed
+            if row.get("allowed_uom"):
+                allowed_uoms.append(row.allowed_uom)
+            elif row.get("allowed_uoms"):
+                allowed_uoms.append(row.allowed_uoms)
 
         # Remove duplicates
         allowed_uoms = list(set(allowed_uoms))
 
-        print(f"🎯 Final allowed UOMs: {allowed_uoms}")
-
-        result = {
+        return {
             "enabled": True,
             "uoms": allowed_uoms
         }
 
-        print(f"🚀 Returning: {result}")
-        print("🔥 === END get_user_uom_config ===\n")
-
-        return result
-
     except Exception as e:
-        print("❌ ERROR in get_user_uom_config")
-        print(str(e))
         frappe.log_error(frappe.get_traceback(), "get_user_uom_config error")
 
         return {
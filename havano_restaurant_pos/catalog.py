@@ -0,0 +1,90 @@
+"""
+POS menu catalog snapshot cache.
+
+Terminals load the full menu at every shift start. The catalog a user sees only
+depends on (price list, cost center, item_view_per_cost_center), so the built
+payload is cached in Redis per combination and tagged with a catalog version.
+The version is bumped (after commit) whenever Item, Item Price, Item Barcode,
+Item Group or HA POS Settings change, which makes every cached snapshot stale at once.
+"""
+
+import frappe
+
+CATALOG_VERSION_KEY = "havano_pos:catalog_version"
+CATALOG_SNAPSHOT_PREFIX = "havano_pos:catalog_snapshot"
+
+# Snapshots of old versions are never read again, let them expire on their own
+CATALOG_SNAPSHOT_TTL = 6 * 60 * 60
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if missing."""
+    version = frappe.cache().get_value(CATALOG_VERSION_KEY)
+    if not version:
+        version = _set_new_version()
+    return version
+
+
+def _set_new_version():
+    version = frappe.generate_hash(length=12)
+    frappe.cache().set_value(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version(doc=None, method=None):
+    """
+    Invalidate all catalog snapshots.
+    Used as a doc_event; the bump is deferred until the transaction commits so a
+    concurrent rebuild cannot cache pre-commit data under the new version.
+    """
+    frappe.db.after_commit.add(_set_new_version)
+
+
+def get_catalog_snapshot(price_list, cost_center, use_cost_center, builder):
+    """
+    Return the cached catalog for the given key, building it with `builder()` on a miss.
+
+    Args:
+        price_list: User's price list (may be None)
+        cost_center: User's cost center (may be None)
+        use_cost_center: HA POS Settings.item_view_per_cost_center
+        builder: Callable returning the list of menu items
+    """
+    version = get_catalog_version()
+    key = "{}:{}:{}:{}:{}".format(
+        CATALOG_SNAPSHOT_PREFIX, version, price_list or "", cost_center or "", 1 if use_cost_center else 0
+    )
+
+    items = frappe.cache().get_value(key)
+    if items is None:
+        items = builder()
+        frappe.cache().set_value(key, items, expires_in_sec=CATALOG_SNAPSHOT_TTL)
+
+    return items
+
+
+def index_item_prices(price_rows):
+    """
+    Group Item Price rows into item_code -> {uom: rate} in a single pass.
+    A later row for the same (item_code, uom) wins, as with a flat dict.
+    """
+    prices_by_item = {}
+    for row in price_rows:
+        prices_by_item.setdefault(row["item_code"], {})[row["uom"]] = row["price_list_rate"]
+    return prices_by_item
+
+
+def index_item_barcodes(barcode_rows):
+    """Group Item Barcode rows into item_code -> [barcode, ...]."""
+    barcodes_by_item = {}
+    for row in barcode_rows:
+        barcodes_by_item.setdefault(row["parent"], []).append(row.get("barcode") or "")
+    return barcodes_by_item
+
+
+def attach_prices_and_barcodes(items, prices_by_item, barcodes_by_item):
+    """Set `prices_by_uom` and `barcodes` on each menu item (dict lookups only)."""
+    for item in items:
+        item["prices_by_uom"] = dict(prices_by_item.get(item["name"], {}))
+        item["barcodes"] = barcodes_by_item.get(item["name"], [])
+    return items
@@ -0,0 +1,209 @@
+"""
+Bounded worker pool for post-checkout processing.
+
+create_invoice_and_payment_queue returns as soon as the draft invoice is committed and
+hands the submit / payment / HA Order work to this pool. The pool has a fixed number of
+threads, each keeping its own site connection between jobs, and a bounded backlog so a
+rush cannot open an unbounded number of threads and MariaDB connections inside a web
+worker. When the backlog is full, jobs overflow to the regular background queue.
+
+Sizing can be tuned per site in site_config.json:
+    "havano_checkout_workers": 4,
+    "havano_checkout_backlog": 100
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+import frappe
+
+DEFAULT_WORKERS = 4
+DEFAULT_BACKLOG = 100
+LATENCY_SAMPLES = 500
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class CheckoutWorkerPool:
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_backlog=DEFAULT_BACKLOG):
+        self.max_workers = max_workers
+        self.max_backlog = max_backlog
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._overflowed = 0
+        self._wait_times = deque(maxlen=LATENCY_SAMPLES)
+        self._run_times = deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, site, method, kwargs):
+        """Queue `method(**kwargs)` for `site`. Returns False when the backlog is full."""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((site, method, kwargs, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._overflowed += 1
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len([t for t in self._threads if t.is_alive()]),
+                "max_workers": self.max_workers,
+                "queue_depth": self._queue.qsize(),
+                "max_backlog": self.max_backlog,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "overflowed": self._overflowed,
+                "wait_ms": _summarize(self._wait_times),
+                "run_ms": _summarize(self._run_times),
+            }
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"havano-checkout-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        connected_site = None
+        while True:
+            site, method, kwargs, queued_at = self._queue.get()
+            started = time.monotonic()
+            with self._lock:
+                self._in_flight += 1
+
+            ok = False
+            try:
+                connected_site = _prepare_connection(site, connected_site)
+                method(**kwargs)
+                frappe.db.commit()
+                ok = True
+            except Exception:
+                try:
+                    frappe.db.rollback()
+                    frappe.log_error(frappe.get_traceback(), "Checkout Worker Job Failed")
+                except Exception:
+                    pass
+                # Never reuse a connection that may be in a broken state
+                connected_site = _close_connection(connected_site)
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self._in_flight -= 1
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                    self._wait_times.append((started - queued_at) * 1000)
+                    self._run_times.append((finished - started) * 1000)
+                self._queue.task_done()
+
+
+def _prepare_connection(site, connected_site):
+    """Reuse the thread's site connection, resetting per-job state; reconnect if needed."""
+    if connected_site and connected_site != site:
+        connected_site = _close_connection(connected_site)
+
+    if connected_site:
+        db = frappe.local.db
+        try:
+            db.rollback()
+            db.sql("select 1")
+        except Exception:
+            connected_site = _close_connection(connected_site)
+        else:
+            _reset_job_state()
+            frappe.set_user("Administrator")
+            return site
+
+    frappe.init(site=site)
+    frappe.connect()
+    return site
+
+
+def _reset_job_state():
+    """
+    Fresh flags, caches and message logs for the next job on the same site and DB
+    connection. frappe.init(force=True) would leave the previous locals (and their
+    connection) behind without a destroy, so only per-request state is reset here.
+    """
+    local = frappe.local
+    local.flags = frappe._dict()
+    local.form_dict = frappe._dict()
+    local.response = frappe._dict({"docs": []})
+    local.message_log = []
+    local.debug_log = []
+    local.realtime_log = []
+    local.error_log = []
+    local.cache = {}
+    local.document_cache = {}
+    local.request_cache = defaultdict(dict)
+    local.role_permissions = {}
+    local.new_doc_templates = {}
+
+
+def _close_connection(connected_site):
+    if connected_site:
+        try:
+            frappe.destroy()
+        except Exception:
+            pass
+    return None
+
+
+def _summarize(samples):
+    if not samples:
+        return {"p50": 0, "p95": 0, "max": 0}
+    ordered = sorted(samples)
+    return {
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CheckoutWorkerPool(
+                    max_workers=frappe.conf.get("havano_checkout_workers") or DEFAULT_WORKERS,
+                    max_backlog=frappe.conf.get("havano_checkout_backlog") or DEFAULT_BACKLOG,
+                )
+    return _pool
+
+
+def submit_checkout_job(method, job_name=None, **kwargs):
+    """
+    Run `method(**kwargs)` on the checkout pool, overflowing to the background queue
+    when the pool backlog is full. Returns "pool" or "queue".
+    """
+    if get_pool().submit(frappe.local.site, method, kwargs):
+        return "pool"
+
+    frappe.enqueue(
+        method,
+        queue="short",
+        timeout=300,
+        job_name=job_name,
+        enqueue_after_commit=True,
+        **kwargs,
+    )
+    return "queue"
+
@@ -1,4 +1,11 @@
 import frappe
+from frappe.utils import flt, now
+
+STANDARD_SELLING = "Standard Selling"
+STANDARD_RATE_QUEUE_KEY = "havano_pos:standard_rate_queue"
+STANDARD_RATE_JOB_ID = "havano_pos_standard_rate_sync"
+# queue member that only asks the job for a catalog bump (price list imports)
+CATALOG_BUMP_ONLY = "__catalog__"
 
 
 def sales_invoice_before_submit(doc, method):
@@ -25,21 +32,128 @@ def update_standard_rate(doc, method):
     """
     Updates the Item's standard_rate when the Item Price
     for 'Standard Selling' price list is updated.
+
+    The item code is queued in a Redis set once the price is committed and a single
+    deduplicated background job (sync_standard_rates) writes standard_rate for all queued
+    items in bulk, so a price list import does not save every Item. The job also bumps the
+    POS catalog; other price lists bump it here, or through the job during imports.
     """
-    try:
-        if doc.price_list == "Standard Selling":
-            if not doc.item_code:
-                frappe.throw("Item Code is missing in Item Price document")
+    if doc.price_list != STANDARD_SELLING:
+        if frappe.flags.in_import:
+            frappe.db.after_commit.add(lambda: _queue_standard_rate_sync(CATALOG_BUMP_ONLY))
+        else:
+            from havano_restaurant_pos.catalog import bump_catalog_version
+
+            bump_catalog_version()
+        return
+
+    if not doc.item_code:
+        frappe.throw("Item Code is missing in Item Price document")
+
+    item_code = doc.item_code
+    frappe.db.after_commit.add(lambda: _queue_standard_rate_sync(item_code))
+
+
+def _queue_standard_rate_sync(*item_codes):
+    cache = frappe.cache()
+    cache.execute_command("SADD", cache.make_key(STANDARD_RATE_QUEUE_KEY), *item_codes)
+    # one job at a time; items queued while it runs are drained by it or by the cron run
+    frappe.enqueue(
+        "havano_restaurant_pos.doc_events.sync_standard_rates",
+        queue="short",
+        job_id=STANDARD_RATE_JOB_ID,
+        deduplicate=True,
+    )
+
+
+def sync_standard_rates():
+    """
+    Background job / cron: write queued items' standard_rate and bump the catalog.
+    Each drained batch is committed on its own, so a failure only re-queues that batch.
+    """
+    from havano_restaurant_pos.catalog import bump_catalog_version
+    from havano_restaurant_pos.search import reindex_items
+
+    cache = frappe.cache()
+    key = cache.make_key(STANDARD_RATE_QUEUE_KEY)
 
-            item = frappe.get_doc("Item", doc.item_code)
+    while True:
+        pipe = cache.pipeline()
+        pipe.smembers(key)
+        pipe.delete(key)
+        members = {frappe.safe_decode(member) for member in pipe.execute()[0]}
+        if not members:
+            return
 
-            item.standard_rate = doc.price_list_rate
+        try:
+            synced = _write_standard_rates([code for code in members if code != CATALOG_BUMP_ONLY])
+            bump_catalog_version()
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            cache.execute_command("SADD", key, *members)
+            frappe.log_error(frappe.get_traceback(), "Error in update_standard_rate")
+            return
 
-            item.flags.ignore_validate = True
-            item.flags.ignore_permissions = True
-            item.save()
+        if synced:
+            reindex_items(synced)
 
 
-    except Exception as e:
-        frappe.log_error(frappe.get_traceback(), "Error in update_standard_rate")
-        frappe.throw(f"Error updating Item Standard Rate: {e}")
+def _write_standard_rates(item_codes):
+    """Set Item.standard_rate from the Standard Selling price, one UPDATE per distinct rate."""
+    if not item_codes:
+        return []
+
+    rates = {}
+    for row in frappe.get_all(
+        "Item Price",
+        filters={"price_list": STANDARD_SELLING, "item_code": ["in", item_codes]},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified asc",
+    ):
+        # the most recently modified price of an item wins
+        rates[row.item_code] = flt(row.price_list_rate)
+
+    items_by_rate = {}
+    for item_code, rate in rates.items():
+        items_by_rate.setdefault(rate, []).append(item_code)
+
+    # modified is bumped too, so get_menu_items_delta picks the items up
+    timestamp = now()
+    for rate, codes in items_by_rate.items():
+        frappe.db.sql(
+            "update `tabItem` set standard_rate = %s, modified = %s where name in %s",
+            (rate, timestamp, codes),
+        )
+
+    for item_code in rates:
+        frappe.clear_document_cache("Item", item_code)
+    return list(rates)
+
+
+def stock_ledger_entry_on_submit(doc, method):
+    """Push the new Bin quantities of touched items to POS clients once the stock posting commits."""
+    pending = frappe.flags.havano_stock_changes
+    if pending is None:
+        pending = frappe.flags.havano_stock_changes = set()
+    pending.add((doc.item_code, doc.warehouse))
+    frappe.db.after_commit.add(_publish_stock_changes)
+
+
+def _publish_stock_changes():
+    pending = frappe.flags.havano_stock_changes or set()
+    frappe.flags.havano_stock_changes = None
+    if not pending:
+        return
+
+    from havano_restaurant_pos.reservations import publish_stock
+
+    try:
+        by_warehouse = {}
+        for item_code, warehouse in pending:
+            by_warehouse.setdefault(warehouse, set()).add(item_code)
+
+        for warehouse, item_codes in by_warehouse.items():
+            publish_stock(warehouse, item_codes)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "HA POS: stock update push")
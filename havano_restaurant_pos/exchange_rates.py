@@ -0,0 +1,107 @@
+"""
+Shared exchange-rate lookups.
+
+The trial balance override, the HA POS Invoice checkout, HA POS Payment Method and the
+payment entry builders in api.py each asked ERPNext (or Currency Exchange directly) for
+the same few rates again and again; a trial balance over a year of ZWG/USD entries made
+thousands of lookups, some of them twice to find the inverse pair. Rates are cached in
+one Redis hash keyed by (from, to, date), with the inverse-pair resolution of the report
+override cached as its own entry, and the hash is dropped whenever a Currency Exchange
+record changes. Missing or failed rates (0 / None) are not cached, and the hash expires
+after EXCHANGE_RATE_TTL so rates from ERPNext's exchange-rate provider are refreshed too.
+"""
+
+import frappe
+from frappe.utils import flt, nowdate
+
+EXCHANGE_RATE_KEY = "havano_pos:exchange_rates"
+# counted from the first rate cached after the hash was dropped
+EXCHANGE_RATE_TTL = 60 * 60
+
+
+def clear_exchange_rates(doc=None, method=None):
+    """doc_event (Currency Exchange): drop cached rates (again after commit)."""
+    _clear()
+    frappe.db.after_commit.add(_clear)
+
+
+def _clear():
+    frappe.cache().delete_value(EXCHANGE_RATE_KEY)
+
+
+def _cached(key, generator):
+    cache = frappe.cache()
+    # hget also memoises per request, so repeated lookups in one report stay in memory
+    value = cache.hget(EXCHANGE_RATE_KEY, key)
+    if value:
+        return value
+
+    value = generator()
+    # a missing rate or a failed provider call is retried on the next lookup
+    if value:
+        cache.hset(EXCHANGE_RATE_KEY, key, value)
+        raw_key = cache.make_key(EXCHANGE_RATE_KEY)
+        if cache.ttl(raw_key) < 0:
+            cache.expire(raw_key, EXCHANGE_RATE_TTL)
+    return value
+
+
+def get_exchange_rate(from_currency, to_currency, transaction_date=None):
+    """erpnext.setup.utils.get_exchange_rate, cached per (from, to, date)."""
+    transaction_date = str(transaction_date or nowdate())
+
+    def generator():
+        from erpnext.setup.utils import get_exchange_rate as erpnext_get_exchange_rate
+
+        return erpnext_get_exchange_rate(from_currency, to_currency, transaction_date)
+
+    return _cached(f"rate:{from_currency}:{to_currency}:{transaction_date}", generator)
+
+
+def get_latest_rate(from_currency, to_currency):
+    """Stored Currency Exchange rate for a pair regardless of date, or None."""
+    return _cached(
+        f"latest:{from_currency}:{to_currency}",
+        lambda: frappe.db.get_value(
+            "Currency Exchange",
+            {"from_currency": from_currency, "to_currency": to_currency},
+            "exchange_rate",
+        ),
+    )
+
+
+def get_report_rate(date, from_currency, to_currency):
+    """
+    Rate used by the trial balance override to divide account-currency amounts:
+    the direct rate, or the inverse pair's rate when the direct one is below 1 or
+    missing (e.g. ZWG -> USD 0.0301 resolves to USD -> ZWG 33.2). Resolved once per
+    (from, to, date).
+    """
+    return _cached(
+        f"report:{from_currency}:{to_currency}:{date}",
+        lambda: _resolve_report_rate(date, from_currency, to_currency),
+    )
+
+
+def _resolve_report_rate(date, from_currency, to_currency):
+    rate = flt(get_exchange_rate(from_currency, to_currency, date)) or 1
+
+    if from_currency != to_currency:
+        # If rate is less than 1.0, it might be the inverse of what we need
+        if 0 < rate < 1.0:
+            try:
+                inverse_rate = flt(get_exchange_rate(to_currency, from_currency, date))
+                if inverse_rate > 1.0:
+                    rate = inverse_rate
+            except Exception:
+                pass
+        # rate of 1 usually means no direct rate was found
+        elif rate == 1:
+            try:
+                inverse_rate = flt(get_exchange_rate(to_currency, from_currency, date))
+                if inverse_rate and inverse_rate != 1:
+                    rate = inverse_rate
+            except Exception:
+                pass
+
+    return rate
@@ -0,0 +1,220 @@
+"""
+Live floor snapshot for the table board.
+
+Every tablet used to pull the HA Table list and then ask get_table_orders for each
+table on every navigation. The server now keeps one snapshot row per table in a Redis
+hash (status, waiter, customer, open order count, last order time). When an order or
+table changes, the affected rows are recomputed after the transaction commits and
+only the rows that actually changed are pushed to clients on FLOOR_EVENT.
+
+The hash only counts as complete while FLOOR_BUILT_KEY is set; that marker is written
+by the full rebuild alone, so rows refreshed on a cold cache never pass for the floor.
+FLOOR_NUMBERS_KEY maps table_number -> table next to it, for orders that only carry
+the number.
+"""
+
+import frappe
+from frappe.utils import get_datetime, get_datetime_str, now_datetime
+
+FLOOR_SNAPSHOT_KEY = "havano_pos:floor_snapshot"
+FLOOR_BUILT_KEY = "havano_pos:floor_snapshot_built"
+FLOOR_NUMBERS_KEY = "havano_pos:floor_table_numbers"
+FLOOR_EVENT = "havano_floor_update"
+
+TABLE_FIELDS = ["name", "table_number", "capacity", "status", "floor", "assigned_waiter", "customer_name"]
+
+
+def get_floor_snapshot():
+    """Return {"server_time", "tables": [row, ...]} building the snapshot on a cold cache."""
+    if _is_built():
+        rows = frappe.cache().hgetall(FLOOR_SNAPSHOT_KEY)
+    else:
+        rows = _rebuild()
+
+    return {
+        "server_time": get_datetime_str(now_datetime()),
+        "tables": sorted(rows.values(), key=lambda row: (row.get("table_number") or 0, row["name"])),
+    }
+
+
+def _is_built():
+    return bool(frappe.cache().get_value(FLOOR_BUILT_KEY))
+
+
+def _rebuild():
+    """Store rows for every table, then mark the snapshot complete; returns name -> row."""
+    cache = frappe.cache()
+    rows = {row["name"]: row for row in _build_rows()}
+    cache.delete_value([FLOOR_SNAPSHOT_KEY, FLOOR_NUMBERS_KEY])
+    for name, row in rows.items():
+        cache.hset(FLOOR_SNAPSHOT_KEY, name, row)
+        _set_number(row)
+    cache.set_value(FLOOR_BUILT_KEY, 1)
+    return rows
+
+
+def get_table_snapshot(table):
+    """Return the snapshot row of one table (None if the table does not exist)."""
+    if not _is_built():
+        return _rebuild().get(table)
+
+    row = frappe.cache().hget(FLOOR_SNAPSHOT_KEY, table)
+    if row is None:
+        rows = _build_rows([table])
+        row = rows[0] if rows else None
+        if row:
+            frappe.cache().hset(FLOOR_SNAPSHOT_KEY, table, row)
+    return row
+
+
+def get_table_snapshot_by_number(table_number):
+    """Return the snapshot row whose table_number matches (HA Order stores it as text)."""
+    if not _is_built():
+        for row in _rebuild().values():
+            if str(row.get("table_number")) == str(table_number):
+                return row
+        return None
+
+    table = frappe.cache().hget(FLOOR_NUMBERS_KEY, str(table_number))
+    row = get_table_snapshot(table) if table else None
+    if row and str(row.get("table_number")) == str(table_number):
+        return row
+    return None
+
+
+def _set_number(row):
+    if row.get("table_number") is not None:
+        frappe.cache().hset(FLOOR_NUMBERS_KEY, str(row["table_number"]), row["name"])
+
+
+def _drop_number(row):
+    """Remove the row's number entry unless another table has taken the number since."""
+    if not row or row.get("table_number") is None:
+        return
+    cache = frappe.cache()
+    number = str(row["table_number"])
+    if cache.hget(FLOOR_NUMBERS_KEY, number) == row["name"]:
+        cache.hdel(FLOOR_NUMBERS_KEY, number)
+
+
+def get_waiting_minutes(row):
+    """Minutes since the table's last open order was created."""
+    if not row or not row.get("last_order_at"):
+        return 0
+    return int((now_datetime() - get_datetime(row["last_order_at"])).total_seconds() / 60)
+
+
+def mark_tables_dirty(tables):
+    """Recompute (and publish) the given tables once the current transaction commits."""
+    tables = {table for table in tables if table}
+    if not tables:
+        return
+
+    if frappe.flags.floor_dirty_tables is None:
+        frappe.flags.floor_dirty_tables = set()
+    frappe.flags.floor_dirty_tables.update(tables)
+    # registered every time: a rollback drops callbacks, and a repeated flush is a no-op
+    frappe.db.after_commit.add(_flush_dirty_tables)
+
+
+def _flush_dirty_tables():
+    tables = frappe.flags.floor_dirty_tables or set()
+    frappe.flags.floor_dirty_tables = None
+    if tables:
+        refresh_tables(tables)
+
+
+def refresh_tables(tables):
+    """Recompute snapshot rows for `tables`, store them and publish the rows that changed."""
+    cache = frappe.cache()
+    fresh = {row["name"]: row for row in _build_rows(list(tables))}
+
+    if not _is_built():
+        # nothing to update or compare against; the next read rebuilds every table
+        frappe.publish_realtime(
+            FLOOR_EVENT,
+            {
+                "server_time": get_datetime_str(now_datetime()),
+                "tables": list(fresh.values()),
+                "removed": [table for table in tables if table not in fresh],
+            },
+        )
+        return
+
+    changed, removed = [], []
+    for table in tables:
+        row = fresh.get(table)
+        stored = cache.hget(FLOOR_SNAPSHOT_KEY, table)
+        if row is None:
+            if stored is not None:
+                cache.hdel(FLOOR_SNAPSHOT_KEY, table)
+                _drop_number(stored)
+                removed.append(table)
+            continue
+        if stored != row:
+            cache.hset(FLOOR_SNAPSHOT_KEY, table, row)
+            if stored and stored.get("table_number") != row.get("table_number"):
+                _drop_number(stored)
+            _set_number(row)
+            changed.append(row)
+
+    if changed or removed:
+        frappe.publish_realtime(
+            FLOOR_EVENT,
+            {"server_time": get_datetime_str(now_datetime()), "tables": changed, "removed": removed},
+        )
+
+
+def clear_floor_snapshot():
+    frappe.cache().delete_value([FLOOR_BUILT_KEY, FLOOR_SNAPSHOT_KEY, FLOOR_NUMBERS_KEY])
+
+
+def _build_rows(tables=None):
+    """Snapshot rows for `tables` (all tables if None): one query for tables, one for orders."""
+    filters = {"name": ["in", tables]} if tables is not None else None
+    table_rows = frappe.get_all("HA Table", filters=filters, fields=TABLE_FIELDS)
+    if not table_rows:
+        return []
+
+    order_filters = {"docstatus": 0, "table": ["in", [row.name for row in table_rows]]}
+    order_stats = {
+        row.table: row
+        for row in frappe.get_all(
+            "HA Order",
+            filters=order_filters,
+            fields=["table", "count(name) as open_orders", "max(creation) as last_order_at"],
+            group_by="table",
+        )
+    }
+
+    rows = []
+    for table in table_rows:
+        stats = order_stats.get(table.name) or {}
+        rows.append(
+            {
+                "name": table.name,
+                "table_number": table.table_number,
+                "capacity": table.capacity,
+                "floor": table.floor,
+                "status": table.status,
+                "waiter": table.assigned_waiter,
+                "customer_name": table.customer_name,
+                "open_orders": stats.get("open_orders") or 0,
+                "last_order_at": get_datetime_str(stats["last_order_at"]) if stats.get("last_order_at") else None,
+            }
+        )
+    return rows
+
+
+def on_order_change(doc, method=None):
+    """doc_event (HA Order): refresh the order's table, and its previous table if it moved."""
+    tables = [doc.get("table")]
+    previous = doc.get_doc_before_save()
+    if previous:
+        tables.append(previous.get("table"))
+    mark_tables_dirty(tables)
+
+
+def on_table_change(doc, method=None):
+    """doc_event (HA Table)."""
+    mark_tables_dirty([doc.name])
@@ -81,6 +81,14 @@ class HAOrder(Document):
         frappe.db.commit()
 
 
+
+def on_doctype_update():
+    # open orders of a table: get_table_orders / download_table_orders_json / mark_table_as_paid
+    frappe.db.add_index("HA Order", ["table_number", "docstatus"])
+    frappe.db.add_index("HA Order", ["table", "docstatus"])
+    frappe.db.add_index("HA Order", ["table", "order_status"])
+
+
 @frappe.whitelist()
 def mark_as_paid(docname, sales_invoice=None):
     doc = frappe.get_doc("HA Order", docname)
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Chipo and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("HA POS Checkout Job", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,304 @@
+# Copyright (c) 2026, Chipo and contributors
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_datetime, cint, flt, now_datetime
+
+from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+	get_pos_setting,
+)
+
+# Retry backoff: 30s, 1m, 2m, 4m ... capped, then the job is marked Failed
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 30 * 60
+
+# A job left in Processing this long belongs to a worker that died (restart, OOM)
+STALE_PROCESSING_SECONDS = 10 * 60
+
+DRAIN_BATCH_SIZE = 50
+
+# Set while a batch tick is waiting on the pool, so one tick collects a burst of sales
+BATCH_PENDING_KEY = "havano_pos:checkout_batch_pending"
+BATCH_PENDING_TTL = 30
+
+
+class HAPOSCheckoutJob(Document):
+	pass
+
+
+def create_checkout_job(sales_invoice, payload):
+	"""
+	Record the post-checkout work for a draft invoice.
+	Must run in the same transaction as the draft invoice insert, so a committed
+	invoice always has a job. The invoice name is the job name (idempotency key).
+	"""
+	job = frappe.new_doc("HA POS Checkout Job")
+	job.sales_invoice = sales_invoice
+	job.status = "Queued"
+	job.next_attempt_at = now_datetime()
+	job.payload = frappe.as_json(payload)
+	job.insert(ignore_permissions=True)
+	return job.name
+
+
+def _claim(job_name):
+	"""Atomically move a due job to Processing. Returns False if someone else has it."""
+	now = now_datetime()
+	stale_before = add_to_datetime(now, seconds=-STALE_PROCESSING_SECONDS)
+	frappe.db.sql(
+		"""
+		update `tabHA POS Checkout Job`
+		set status = 'Processing', attempts = attempts + 1, modified = %(now)s
+		where name = %(name)s
+			and (
+				(status = 'Queued' and (next_attempt_at is null or next_attempt_at <= %(now)s))
+				or (status = 'Processing' and modified < %(stale_before)s)
+			)
+		""",
+		{"name": job_name, "now": now, "stale_before": stale_before},
+	)
+	claimed = frappe.db.sql("select row_count()")[0][0] == 1
+	frappe.db.commit()
+	return claimed
+
+
+def _is_settled(sales_invoice):
+	"""Invoice submitted and nothing left to pay (e.g. a retry after a partial run)."""
+	invoice = frappe.db.get_value(
+		"Sales Invoice", sales_invoice, ["docstatus", "outstanding_amount"], as_dict=True
+	)
+	return bool(invoice and invoice.docstatus == 1 and flt(invoice.outstanding_amount) <= 0)
+
+
+def _retry_delay(attempts):
+	"""Seconds to wait after failed attempt number `attempts`: 30s, 1m, 2m ... capped."""
+	return min(BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+
+
+def _failure_values(attempts, error, now=None):
+	"""Job fields after a failed attempt: Queued again with backoff, or Failed at MAX_ATTEMPTS."""
+	if attempts >= MAX_ATTEMPTS:
+		return {"status": "Failed", "last_error": error}
+	return {
+		"status": "Queued",
+		"last_error": error,
+		"next_attempt_at": add_to_datetime(now or now_datetime(), seconds=_retry_delay(attempts)),
+	}
+
+
+def _finish(job_name, result):
+	attempts = frappe.db.get_value("HA POS Checkout Job", job_name, "attempts") or 0
+	sales_invoice = job_name
+
+	if (result and result.get("success")) or _is_settled(sales_invoice):
+		values = {
+			"status": "Completed",
+			"completed_at": now_datetime(),
+			"last_error": None,
+			"order_id": (result or {}).get("order_id"),
+		}
+	else:
+		error = (result or {}).get("details") or (result or {}).get("message") or "Unknown error"
+		values = _failure_values(attempts, error)
+
+	frappe.db.set_value("HA POS Checkout Job", job_name, values)
+	frappe.db.commit()
+	return values["status"]
+
+
+def run_checkout_job(checkout_job):
+	"""Claim and process one checkout job. Safe to call repeatedly for the same job."""
+	from havano_restaurant_pos.api import process_payment_entries
+
+	if not _claim(checkout_job):
+		return None
+
+	payload = frappe.parse_json(frappe.db.get_value("HA POS Checkout Job", checkout_job, "payload") or "{}")
+	try:
+		result = process_payment_entries(checkout_job, **payload)
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(frappe.get_traceback(), "HA POS Checkout Job Error")
+		result = {"success": False, "details": str(e)}
+
+	if result and not result.get("success"):
+		# keep whatever was committed (e.g. the submitted invoice), drop the partial rest
+		frappe.db.rollback()
+
+	return _finish(checkout_job, result)
+
+
+def enqueue_checkout_job(checkout_job):
+	"""Hand a committed checkout job to the pool, on its own or via the next batch tick."""
+	from havano_restaurant_pos.checkout_worker import submit_checkout_job
+
+	if not get_pos_setting("batch_checkout"):
+		submit_checkout_job(run_checkout_job, job_name=f"checkout_job_{checkout_job}", checkout_job=checkout_job)
+		return
+
+	cache = frappe.cache()
+	if cache.set(cache.make_key(BATCH_PENDING_KEY), 1, nx=True, ex=BATCH_PENDING_TTL):
+		submit_checkout_job(run_checkout_batch, job_name="checkout_job_batch")
+
+
+def run_checkout_batch(window_ms=None):
+	"""
+	Micro-batch drain: wait `window_ms` for more sales, then submit every due job's invoice
+	and payments in one transaction with a single commit. A job that fails inside the batch
+	is rolled back to its savepoint and retried on its own afterwards.
+	"""
+	from havano_restaurant_pos.api import process_payment_entries
+
+	if window_ms is None:
+		window_ms = cint(get_pos_setting("checkout_batch_window_ms"))
+	if window_ms:
+		time.sleep(window_ms / 1000.0)
+
+	# sales arriving from here on schedule the next tick
+	frappe.cache().delete_value(BATCH_PENDING_KEY)
+
+	batch_size = cint(get_pos_setting("checkout_batch_size")) or DRAIN_BATCH_SIZE
+	jobs = frappe.db.sql(
+		"""
+		select name, payload from `tabHA POS Checkout Job`
+		where status = 'Queued' and (next_attempt_at is null or next_attempt_at <= %(now)s)
+		order by creation
+		limit %(limit)s
+		for update skip locked
+		""",
+		{"now": now_datetime(), "limit": batch_size},
+		as_dict=True,
+	)
+	if not jobs:
+		frappe.db.rollback()
+		return
+
+	fallback = []
+	frappe.flags.in_checkout_batch = True
+	try:
+		for job in jobs:
+			frappe.db.savepoint("checkout_job")
+			mark = _mark_side_effects()
+			try:
+				result = process_payment_entries(job.name, **frappe.parse_json(job.payload or "{}"))
+			except Exception:
+				result = None
+
+			if result and result.get("success"):
+				frappe.db.sql(
+					"""
+					update `tabHA POS Checkout Job`
+					set status = 'Completed', attempts = attempts + 1, completed_at = %(now)s,
+						order_id = %(order_id)s, last_error = null, modified = %(now)s
+					where name = %(name)s
+					""",
+					{"now": now_datetime(), "order_id": result.get("order_id"), "name": job.name},
+				)
+			else:
+				frappe.db.rollback(save_point="checkout_job")
+				_drop_side_effects(mark)
+				fallback.append(job.name)
+	finally:
+		frappe.flags.in_checkout_batch = False
+
+	frappe.db.commit()
+
+	for job_name in fallback:
+		try:
+			run_checkout_job(job_name)
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), "HA POS Checkout Job Drain Error")
+
+
+# flags holding per-transaction pending work, flushed by an after_commit callback
+PENDING_FLAG_SETS = ("floor_dirty_tables", "havano_stock_changes")
+
+
+def _pending_callbacks():
+	"""Sequences of work queued for the batch commit (callbacks, after-commit jobs, realtime)."""
+	sequences = []
+	for manager in (frappe.db.before_commit, frappe.db.after_commit):
+		functions = getattr(manager, "_functions", manager)
+		if functions is not None:
+			sequences.append(functions)
+	if frappe.flags.enqueue_after_commit:
+		sequences.append(frappe.flags.enqueue_after_commit)
+	if getattr(frappe.local, "_realtime_log", None):
+		sequences.append(frappe.local._realtime_log)
+	return sequences
+
+
+def _mark_side_effects():
+	"""Remember how much commit-time work was queued before a batch job runs."""
+	return {
+		"lengths": {id(seq): len(seq) for seq in _pending_callbacks()},
+		"flags": {flag: set(frappe.flags.get(flag) or ()) for flag in PENDING_FLAG_SETS},
+	}
+
+
+def _drop_side_effects(mark):
+	"""
+	Forget the commit-time work a job queued before it was rolled back to its savepoint
+	(a savepoint rollback keeps the transaction's callbacks), so the batch commit does
+	not publish, ticket or enqueue for rows that no longer exist.
+	"""
+	for seq in _pending_callbacks():
+		keep = mark["lengths"].get(id(seq), 0)
+		while len(seq) > keep:
+			seq.pop()
+	for flag, values in mark["flags"].items():
+		frappe.flags[flag] = values or None
+
+
+def drain_checkout_jobs():
+	"""Scheduler: retry due jobs and pick up jobs orphaned by a dead worker."""
+	if get_pos_setting("batch_checkout"):
+		run_checkout_batch(window_ms=0)
+
+	now = now_datetime()
+	stale_before = add_to_datetime(now, seconds=-STALE_PROCESSING_SECONDS)
+	job_names = frappe.db.sql_list(
+		"""
+		select name from `tabHA POS Checkout Job`
+		where (status = 'Queued' and (next_attempt_at is null or next_attempt_at <= %(now)s))
+			or (status = 'Processing' and modified < %(stale_before)s)
+		order by creation
+		limit %(limit)s
+		""",
+		{"now": now, "stale_before": stale_before, "limit": DRAIN_BATCH_SIZE},
+	)
+
+	for job_name in job_names:
+		try:
+			run_checkout_job(job_name)
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), "HA POS Checkout Job Drain Error")
+
+
+def get_checkout_status(sales_invoice):
+	job = frappe.db.get_value(
+		"HA POS Checkout Job",
+		sales_invoice,
+		["status", "attempts", "next_attempt_at", "completed_at", "order_id", "last_error"],
+		as_dict=True,
+	)
+	if not job:
+		return None
+
+	invoice = frappe.db.get_value(
+		"Sales Invoice", sales_invoice, ["docstatus", "outstanding_amount"], as_dict=True
+	) or {}
+	job.update(
+		{
+			"sales_invoice": sales_invoice,
+			"invoice_docstatus": invoice.get("docstatus"),
+			"outstanding_amount": invoice.get("outstanding_amount"),
+		}
+	)
+	return job
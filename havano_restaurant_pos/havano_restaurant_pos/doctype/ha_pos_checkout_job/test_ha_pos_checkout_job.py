@@ -0,0 +1,112 @@
+# Copyright (c) 2026, Chipo and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_datetime, get_datetime, now_datetime
+
+from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_checkout_job.ha_pos_checkout_job import (
+	MAX_ATTEMPTS,
+	MAX_BACKOFF_SECONDS,
+	_claim,
+	_failure_values,
+	_finish,
+	_retry_delay,
+)
+
+JOB_PREFIX = "_Test Checkout Job"
+
+
+def make_job(suffix, status="Queued", attempts=0, next_attempt_at=None, modified=None):
+	"""Insert a job row directly (no Sales Invoice behind it) and commit, as _claim does."""
+	name = f"{JOB_PREFIX} {suffix}"
+	job = frappe.get_doc(
+		{
+			"doctype": "HA POS Checkout Job",
+			"sales_invoice": name,
+			"status": status,
+			"attempts": attempts,
+			"next_attempt_at": next_attempt_at or now_datetime(),
+			"payload": "{}",
+		}
+	)
+	job.insert(ignore_permissions=True, ignore_links=True)
+	if modified:
+		frappe.db.set_value("HA POS Checkout Job", name, "modified", modified, update_modified=False)
+	frappe.db.commit()
+	return name
+
+
+class TestHAPOSCheckoutJob(FrappeTestCase):
+	def tearDown(self):
+		# _claim and _finish commit, so the rows outlive the test transaction
+		frappe.db.delete("HA POS Checkout Job", {"name": ["like", f"{JOB_PREFIX}%"]})
+		frappe.db.commit()
+
+	def test_retry_delay_doubles_until_capped(self):
+		self.assertEqual([_retry_delay(n) for n in range(1, 6)], [30, 60, 120, 240, 480])
+		self.assertEqual(_retry_delay(7), MAX_BACKOFF_SECONDS)
+		self.assertEqual(_retry_delay(MAX_ATTEMPTS), MAX_BACKOFF_SECONDS)
+
+	def test_failure_values(self):
+		now = get_datetime("2026-06-30 12:00:00")
+
+		values = _failure_values(3, "timeout", now=now)
+		self.assertEqual(values["status"], "Queued")
+		self.assertEqual(values["last_error"], "timeout")
+		self.assertEqual(get_datetime(values["next_attempt_at"]), get_datetime("2026-06-30 12:02:00"))
+
+		values = _failure_values(MAX_ATTEMPTS, "timeout", now=now)
+		self.assertEqual(values, {"status": "Failed", "last_error": "timeout"})
+
+	def test_claim_due_job_once(self):
+		job = make_job("due")
+
+		self.assertTrue(_claim(job))
+		row = frappe.db.get_value("HA POS Checkout Job", job, ["status", "attempts"], as_dict=True)
+		self.assertEqual((row.status, row.attempts), ("Processing", 1))
+		# the UPDATE matched nothing for a second worker
+		self.assertFalse(_claim(job))
+
+	def test_claim_skips_job_not_due(self):
+		job = make_job("backoff", next_attempt_at=add_to_datetime(now_datetime(), seconds=60))
+
+		self.assertFalse(_claim(job))
+		self.assertEqual(frappe.db.get_value("HA POS Checkout Job", job, "status"), "Queued")
+
+	def test_reclaim_stale_processing_job(self):
+		stale = make_job(
+			"stale", status="Processing", attempts=1, modified=add_to_datetime(now_datetime(), minutes=-11)
+		)
+		busy = make_job(
+			"busy", status="Processing", attempts=1, modified=add_to_datetime(now_datetime(), minutes=-5)
+		)
+
+		self.assertTrue(_claim(stale))
+		self.assertEqual(frappe.db.get_value("HA POS Checkout Job", stale, "attempts"), 2)
+		self.assertFalse(_claim(busy))
+
+	def test_finish_retries_then_fails(self):
+		job = make_job("failing")
+
+		self.assertTrue(_claim(job))
+		self.assertEqual(_finish(job, {"success": False, "details": "boom"}), "Queued")
+		row = frappe.db.get_value(
+			"HA POS Checkout Job", job, ["last_error", "next_attempt_at"], as_dict=True
+		)
+		self.assertEqual(row.last_error, "boom")
+		self.assertGreater(get_datetime(row.next_attempt_at), now_datetime())
+		# backing off, so not claimable yet
+		self.assertFalse(_claim(job))
+
+		frappe.db.set_value("HA POS Checkout Job", job, {"status": "Processing", "attempts": MAX_ATTEMPTS})
+		self.assertEqual(_finish(job, {"success": False, "details": "boom"}), "Failed")
+
+	def test_finish_success(self):
+		job = make_job("ok")
+
+		self.assertTrue(_claim(job))
+		self.assertEqual(_finish(job, {"success": True, "order_id": None}), "Completed")
+		row = frappe.db.get_value("HA POS Checkout Job", job, ["status", "completed_at"], as_dict=True)
+		self.assertEqual(row.status, "Completed")
+		self.assertIsNotNone(row.completed_at)
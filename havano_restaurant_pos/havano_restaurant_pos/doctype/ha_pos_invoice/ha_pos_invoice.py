@@ -5,22 +5,20 @@ from frappe.utils import nowdate, getdate, flt, cint, now_datetime
 from frappe import _
 import json
 
+from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import get_user_mapping
+
 class HaPosInvoice(Document):
    pass
 
 
 
 def get_pos_user_defaults():
-    user = frappe.session.user
-
-    settings = frappe.get_single("HA POS Settings")
-
-    for row in settings.user_mapping:
-        if row.user == user:
-            return {
-                "cost_center": row.cost_center,
-                "price_list": row.price_list,
-            }
+    row = get_user_mapping()
+    if row:
+        return {
+            "cost_center": row.cost_center,
+            "price_list": row.price_list,
+        }
 
     return None
 
@@ -47,15 +45,13 @@ def get_last_open_shift_for_current_user():
 def get_pos_user_company_cost_center_and_warehouse():
     user = frappe.session.user
 
-    settings = frappe.get_doc("HA POS Settings")
-
-    for row in settings.user_mapping:
-        if row.user == user:
-            return {
-                "company": row.company,
-                "cost_center": row.cost_center,
-                "warehouse": row.warehouse
-            }
+    row = get_user_mapping(user)
+    if row:
+        return {
+            "company": row.company,
+            "cost_center": row.cost_center,
+            "warehouse": row.warehouse
+        }
 
     frappe.throw(f"User {user} is not mapped in HA POS Settings")
 
@@ -82,11 +78,9 @@ def create_sales_invoice(customer, items, price_list=None, change=None, multi_cu
             if not to_currency or to_currency.upper() == "USD":
                 return 1.0
 
-            rate = frappe.db.get_value(
-                "Currency Exchange",
-                {"from_currency": "USD", "to_currency": to_currency.upper()},
-                "exchange_rate"
-            )
+            from havano_restaurant_pos.exchange_rates import get_latest_rate
+
+            rate = get_latest_rate("USD", to_currency.upper())
             if not rate:
                 frappe.throw(f"No exchange rate found for USD → {to_currency.upper()}")
             return float(rate)
@@ -52,7 +52,7 @@ class HAPOSPaymentMethod(Document):
         
         # Try to get latest exchange rate
         try:
-            from erpnext.setup.utils import get_exchange_rate
+            from havano_restaurant_pos.exchange_rates import get_exchange_rate
             self.exchange_rate = get_exchange_rate(self.currency, company_currency, nowdate())
         except Exception:
             # If exchange rate not found, default to 1
@@ -110,8 +110,9 @@ def get_currency_and_exchange_rate(mode_of_payment):
     # Get exchange rate if currency is different from company currency
     if company_currency and account_currency != company_currency:
         try:
-            from erpnext.setup.utils import get_exchange_rate
             from frappe.utils import nowdate
+
+            from havano_restaurant_pos.exchange_rates import get_exchange_rate
             result["exchange_rate"] = get_exchange_rate(company_currency, account_currency, nowdate())
         except Exception:
             # Default to 1 if exchange rate not found
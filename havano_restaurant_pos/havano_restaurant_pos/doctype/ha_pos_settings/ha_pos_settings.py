@@ -5,6 +5,9 @@ import frappe
 from frappe.model.document import Document
 from frappe import _
 
+from havano_restaurant_pos.catalog import bump_catalog_version
+from havano_restaurant_pos.payment_routing import clear_payment_routes
+
 
 class HAPOSSettings(Document):
 	def validate(self):
@@ -27,3 +30,99 @@ class HAPOSSettings(Document):
 						_("Row {0}: Cost Center '{1}' does not belong to Company '{2}'")
 						.format(row.idx, row.cost_center, row.company)
 					)
+
+	def on_update(self):
+		# price list / cost center mapping drives which catalog a terminal gets
+		bump_catalog_version()
+		clear_settings_cache()
+		# a worker could rebuild from pre-commit data in between, clear again once committed
+		frappe.db.after_commit.add(clear_settings_cache)
+		# credit flags of payment methods are part of the payment routes
+		clear_payment_routes()
+
+
+SETTINGS_INDEX_KEY = "havano_pos:settings_index"
+SETTINGS_TOKEN_KEY = "havano_pos:settings_index_token"
+
+# site -> (token, index); avoids unpickling the Redis copy on every call
+_worker_index = {}
+
+
+def clear_settings_cache():
+	frappe.cache().delete_value([SETTINGS_INDEX_KEY, SETTINGS_TOKEN_KEY])
+
+
+def _build_settings_index():
+	settings = frappe.get_single("HA POS Settings")
+
+	values = settings.as_dict(no_default_fields=True)
+	values.pop("user_mapping", None)
+	values.pop("selected_payment_methods", None)
+
+	user_mapping = [row.as_dict() for row in settings.user_mapping]
+	user_rows = {}
+	for row in user_mapping:
+		if row.user:
+			user_rows.setdefault(row.user, []).append(row)
+
+	payment_methods = {}
+	for row in settings.selected_payment_methods:
+		if row.mode_of_payment:
+			payment_methods.setdefault(row.mode_of_payment, row.as_dict())
+
+	token = frappe.generate_hash(length=10)
+	frappe.cache().set_value(SETTINGS_TOKEN_KEY, token)
+
+	return {
+		"token": token,
+		"values": values,
+		"user_mapping": user_mapping,
+		"user_rows": user_rows,
+		"payment_methods": payment_methods,
+	}
+
+
+def get_settings_index():
+	"""
+	Return HA POS Settings as lookup indexes:
+	values (plain fields), user_mapping (rows in order), user_rows (user -> rows) and payment_methods
+	(mode_of_payment -> row). Cached per worker and in Redis, cleared on save.
+	"""
+	site = getattr(frappe.local, "site", None)
+	token = frappe.cache().get_value(SETTINGS_TOKEN_KEY)
+	cached = _worker_index.get(site)
+	if token and cached and cached[0] == token:
+		return cached[1]
+
+	index = frappe.cache().get_value(SETTINGS_INDEX_KEY, generator=_build_settings_index)
+	_worker_index[site] = (index["token"], index)
+	return index
+
+
+def get_pos_setting(fieldname, default=None):
+	"""Return a plain (non-table) HA POS Settings field."""
+	value = get_settings_index()["values"].get(fieldname)
+	return default if value is None else value
+
+
+def get_user_mapping(user=None):
+	"""Return the first Ha User Mapping row for the user, or None."""
+	rows = get_user_mapping_rows(user)
+	return rows[0] if rows else None
+
+
+def get_user_mapping_rows(user=None):
+	"""Return all Ha User Mapping rows for the user (some settings allow several)."""
+	user = user or frappe.session.user
+	return [frappe._dict(row) for row in get_settings_index()["user_rows"].get(user, [])]
+
+
+def get_user_mappings():
+	"""Return every Ha User Mapping row."""
+	return [frappe._dict(row) for row in get_settings_index()["user_mapping"]]
+
+
+def get_payment_method(mode_of_payment):
+	"""Return the HA POS Payment Method row for a Mode of Payment, or None."""
+	row = get_settings_index()["payment_methods"].get(mode_of_payment)
+	return frappe._dict(row) if row else None
@@ -1,9 +1,14 @@
 # Copyright (c) 2026, Chipo and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class ShiftAmounts(Document):
 	pass
+
+
+def on_doctype_update():
+	# one row per (shift, payment key), see havano_restaurant_pos.shift.add_shift_amounts
+	frappe.db.add_index("Shift Amounts", ["parent", "payment_method"])
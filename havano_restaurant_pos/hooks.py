@@ -146,16 +146,103 @@ after_migrate = ["havano_restaurant_pos.overrides.apply_trial_balance_fix"]
 
 doc_events = {
     "Item Price": {
+        # update_standard_rate also bumps the catalog (once per import)
         "after_insert": "havano_restaurant_pos.doc_events.update_standard_rate",
         "on_update": "havano_restaurant_pos.doc_events.update_standard_rate",
+        "on_trash": "havano_restaurant_pos.catalog.bump_catalog_version",
     },
     "Sales Invoice": {
         "before_submit": "havano_restaurant_pos.doc_events.sales_invoice_before_submit",
         "on_submit": "havano_restaurant_pos.doc_events.sales_invoice_on_submit",
     },
     "Item": {
-        "get_list": "havano_restaurant_pos.api.filter_disabled_items"
-    }
+        "get_list": "havano_restaurant_pos.api.filter_disabled_items",
+        # Item Barcode rows are saved with their parent Item
+        "after_insert": [
+            "havano_restaurant_pos.catalog.bump_catalog_version",
+            "havano_restaurant_pos.search.on_item_change",
+        ],
+        "on_update": [
+            "havano_restaurant_pos.catalog.bump_catalog_version",
+            "havano_restaurant_pos.search.on_item_change",
+        ],
+        "after_rename": [
+            "havano_restaurant_pos.catalog.bump_catalog_version",
+            "havano_restaurant_pos.search.on_item_rename",
+        ],
+        "on_trash": [
+            "havano_restaurant_pos.catalog.bump_catalog_version",
+            "havano_restaurant_pos.search.on_item_change",
+        ],
+    },
+    "Item Group": {
+        "on_update": "havano_restaurant_pos.catalog.bump_catalog_version",
+        "on_trash": "havano_restaurant_pos.catalog.bump_catalog_version",
+    },
+    # Mode of Payment Account rows are saved with their parent Mode of Payment
+    "Mode of Payment": {
+        "after_insert": "havano_restaurant_pos.payment_routing.clear_payment_routes",
+        "on_update": "havano_restaurant_pos.payment_routing.clear_payment_routes",
+        "on_trash": "havano_restaurant_pos.payment_routing.clear_payment_routes",
+    },
+    "Account": {
+        "on_update": "havano_restaurant_pos.payment_routing.clear_payment_routes",
+        "on_trash": "havano_restaurant_pos.payment_routing.clear_payment_routes",
+    },
+    "Company": {
+        "on_update": [
+            "havano_restaurant_pos.payment_routing.clear_payment_routes",
+            "havano_restaurant_pos.receipt.clear_receipt_headers",
+        ],
+    },
+    # Dynamic Link rows are saved with their parent Address
+    "Address": {
+        "on_update": "havano_restaurant_pos.receipt.clear_receipt_headers",
+        "on_trash": "havano_restaurant_pos.receipt.clear_receipt_headers",
+    },
+    "Cost Center Details": {
+        "on_update": "havano_restaurant_pos.receipt.clear_receipt_headers",
+        "on_trash": "havano_restaurant_pos.receipt.clear_receipt_headers",
+    },
+    "User": {
+        "on_update": "havano_restaurant_pos.receipt.clear_receipt_headers",
+        "on_trash": "havano_restaurant_pos.receipt.clear_receipt_headers",
+    },
+    "Currency Exchange": {
+        "on_update": "havano_restaurant_pos.exchange_rates.clear_exchange_rates",
+        "on_trash": "havano_restaurant_pos.exchange_rates.clear_exchange_rates",
+    },
+    "Stock Ledger Entry": {
+        "on_submit": "havano_restaurant_pos.doc_events.stock_ledger_entry_on_submit",
+    },
+    "HA Order": {
+        "after_insert": [
+            "havano_restaurant_pos.floor.on_order_change",
+            "havano_restaurant_pos.kds.on_order_insert",
+            "havano_restaurant_pos.reservations.on_order_insert",
+        ],
+        "on_update": [
+            "havano_restaurant_pos.floor.on_order_change",
+            "havano_restaurant_pos.reservations.on_order_change",
+        ],
+        "on_submit": [
+            "havano_restaurant_pos.floor.on_order_change",
+            "havano_restaurant_pos.reservations.on_order_change",
+        ],
+        "on_cancel": [
+            "havano_restaurant_pos.floor.on_order_change",
+            "havano_restaurant_pos.reservations.on_order_change",
+        ],
+        "on_trash": [
+            "havano_restaurant_pos.floor.on_order_change",
+            "havano_restaurant_pos.reservations.on_order_change",
+        ],
+    },
+    "HA Table": {
+        "after_insert": "havano_restaurant_pos.floor.on_table_change",
+        "on_update": "havano_restaurant_pos.floor.on_table_change",
+        "on_trash": "havano_restaurant_pos.floor.on_table_change",
+    },
 }
 
 # Scheduled Tasks
@@ -179,6 +266,18 @@ doc_events = {
 # 	],
 # }
 
+scheduler_events = {
+    "daily": [
+        "havano_restaurant_pos.reservations.rebuild_reservations",
+    ],
+    "cron": {
+        "* * * * *": [
+            "havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_checkout_job.ha_pos_checkout_job.drain_checkout_jobs",
+            "havano_restaurant_pos.doc_events.sync_standard_rates",
+        ],
+    },
+}
+
 # Testing
 # -------
 
@@ -211,7 +310,6 @@ doc_events = {
 # ----------------
 # before_request = ["havano_restaurant_pos.utils.before_request"]
 # after_request = ["havano_restaurant_pos.utils.after_request"]
-before_request = ["havano_restaurant_pos.overrides.apply_trial_balance_fix"]
 
 # Job Events
 # ----------
@@ -0,0 +1,241 @@
+"""
+Kitchen display (KDS) ticket stream.
+
+Items are routed to preparation stations by the Item flags custom_is_order_item_1..6
+(station 1..6). When an HA Order or a POS invoice is created, one ticket per station
+is stored in a Redis hash for that station and pushed to the station's realtime event
+(KDS_EVENT_PREFIX + station), so kitchen screens no longer poll invoice JSON.
+Screens acknowledge with bump (done) and can recall a bumped ticket.
+
+A sale is ticketed once: the ticket source is the Sales Invoice when there is one,
+so the HA Order created later for a POS invoice does not send the same items again.
+"""
+
+import frappe
+from frappe.utils import cint, get_datetime_str, now_datetime
+
+STATIONS = range(1, 7)
+STATION_FIELD = "custom_is_order_item_{0}"
+
+KDS_TICKETS_KEY = "havano_pos:kds_tickets"
+KDS_BUMPED_KEY = "havano_pos:kds_bumped"
+KDS_SENT_KEY = "havano_pos:kds_sent"
+KDS_EVENT_PREFIX = "havano_kds:"
+
+# Station hashes expire when a station has been idle this long
+KDS_TICKET_TTL = 24 * 60 * 60
+KDS_SENT_TTL = 24 * 60 * 60
+KDS_BUMPED_KEEP = 50
+
+
+def _station_key(prefix, station):
+    return f"{prefix}:{station}"
+
+
+def get_station_map(item_codes):
+    """Return item_code -> [station, ...] from the Item order flags (one query)."""
+    if not item_codes:
+        return {}
+
+    meta = frappe.get_meta("Item")
+    fields = {station: STATION_FIELD.format(station) for station in STATIONS}
+    fields = {station: field for station, field in fields.items() if meta.has_field(field)}
+    if not fields:
+        return {}
+
+    rows = frappe.get_all(
+        "Item",
+        filters={"name": ["in", list(set(item_codes))]},
+        fields=["name", *fields.values()],
+    )
+    return {
+        row.name: [station for station, field in fields.items() if cint(row.get(field))]
+        for row in rows
+    }
+
+
+def build_tickets(source, header, items):
+    """
+    Split `items` ({item_code, item_name, qty, remark}) into one ticket per station.
+    `source` identifies the sale; `header` carries order_type, table, waiter, customer.
+    """
+    station_map = get_station_map([item["item_code"] for item in items if item.get("item_code")])
+    created_at = get_datetime_str(now_datetime())
+
+    tickets = {}
+    for item in items:
+        for station in station_map.get(item.get("item_code"), []):
+            ticket = tickets.get(station)
+            if not ticket:
+                ticket = tickets[station] = dict(
+                    header,
+                    ticket_id=f"{source}:{station}",
+                    source=source,
+                    station=station,
+                    status="Open",
+                    created_at=created_at,
+                    items=[],
+                )
+            ticket["items"].append(
+                {
+                    "item_code": item.get("item_code"),
+                    "item_name": item.get("item_name") or item.get("item_code"),
+                    "qty": item.get("qty"),
+                    "remark": item.get("remark") or "",
+                }
+            )
+    return list(tickets.values())
+
+
+def queue_tickets(source, header, items):
+    """Send the tickets of a sale once the current transaction commits."""
+    tickets = build_tickets(source, header, items)
+    if tickets:
+        frappe.db.after_commit.add(lambda: _send_tickets(source, tickets))
+
+
+def _send_tickets(source, tickets):
+    cache = frappe.cache()
+    # the first writer for a sale wins; retries and the later HA Order are ignored
+    if not cache.set(cache.make_key(_station_key(KDS_SENT_KEY, source)), 1, nx=True, ex=KDS_SENT_TTL):
+        return
+
+    for ticket in tickets:
+        key = _station_key(KDS_TICKETS_KEY, ticket["station"])
+        cache.hset(key, ticket["ticket_id"], ticket)
+        cache.expire(cache.make_key(key), KDS_TICKET_TTL)
+        _publish(ticket["station"], "new", ticket)
+
+
+def _publish(station, action, ticket):
+    frappe.publish_realtime(f"{KDS_EVENT_PREFIX}{station}", {"action": action, "ticket": ticket})
+
+
+def get_tickets(station, include_bumped=False):
+    """Open tickets of a station, oldest first (and the recently bumped ones if asked)."""
+    station = cint(station)
+    cache = frappe.cache()
+    result = {
+        "station": station,
+        "tickets": sorted(
+            cache.hgetall(_station_key(KDS_TICKETS_KEY, station)).values(),
+            key=lambda ticket: ticket["created_at"],
+        ),
+    }
+    if include_bumped:
+        result["bumped"] = sorted(
+            cache.hgetall(_station_key(KDS_BUMPED_KEY, station)).values(),
+            key=lambda ticket: ticket["bumped_at"],
+            reverse=True,
+        )
+    return result
+
+
+def bump_ticket(station, ticket_id):
+    """Mark a ticket done: move it to the station's bumped list and notify screens."""
+    station = cint(station)
+    cache = frappe.cache()
+    open_key = _station_key(KDS_TICKETS_KEY, station)
+    bumped_key = _station_key(KDS_BUMPED_KEY, station)
+
+    ticket = cache.hget(open_key, ticket_id)
+    if not ticket:
+        return None
+
+    ticket.update(status="Bumped", bumped_at=get_datetime_str(now_datetime()), bumped_by=frappe.session.user)
+    cache.hset(bumped_key, ticket_id, ticket)
+    cache.hdel(open_key, ticket_id)
+    cache.expire(cache.make_key(bumped_key), KDS_TICKET_TTL)
+    _trim_bumped(bumped_key)
+
+    _publish(station, "bump", ticket)
+    return ticket
+
+
+def recall_ticket(station, ticket_id):
+    """Bring a bumped ticket back to the station's open tickets."""
+    station = cint(station)
+    cache = frappe.cache()
+    open_key = _station_key(KDS_TICKETS_KEY, station)
+    bumped_key = _station_key(KDS_BUMPED_KEY, station)
+
+    ticket = cache.hget(bumped_key, ticket_id)
+    if not ticket:
+        return None
+
+    ticket["status"] = "Open"
+    ticket.pop("bumped_at", None)
+    ticket.pop("bumped_by", None)
+    cache.hset(open_key, ticket_id, ticket)
+    cache.hdel(bumped_key, ticket_id)
+    cache.expire(cache.make_key(open_key), KDS_TICKET_TTL)
+
+    _publish(station, "recall", ticket)
+    return ticket
+
+
+def _trim_bumped(bumped_key):
+    bumped = frappe.cache().hgetall(bumped_key)
+    if len(bumped) <= KDS_BUMPED_KEEP:
+        return
+    oldest = sorted(bumped.values(), key=lambda ticket: ticket["bumped_at"])
+    for ticket in oldest[: len(bumped) - KDS_BUMPED_KEEP]:
+        frappe.cache().hdel(bumped_key, ticket["ticket_id"])
+
+
+def _order_header(order_type=None, table=None, table_number=None, waiter=None, customer_name=None):
+    return {
+        "order_type": order_type,
+        "table": table,
+        "table_number": table_number,
+        "waiter": waiter,
+        "customer_name": customer_name,
+    }
+
+
+def on_order_insert(doc, method=None):
+    """doc_event (HA Order after_insert): ticket the order, unless its invoice already was."""
+    source = doc.sales_invoice or doc.name
+    header = _order_header(doc.order_type, doc.table, doc.table_number, doc.waiter, doc.customer_name)
+    header["order_id"] = doc.name
+    items = [
+        {
+            "item_code": row.menu_item,
+            "item_name": row.menu_item_name,
+            "qty": row.qty,
+            "remark": row.preparation_remark,
+        }
+        for row in doc.order_items
+    ]
+    queue_tickets(source, header, items)
+
+
+def queue_invoice_tickets(invoice_name, order_payload=None):
+    """Ticket a POS invoice at checkout, before its submit / HA Order run in the background."""
+    order_payload = order_payload or {}
+    header = _order_header(
+        order_payload.get("order_type"),
+        order_payload.get("table"),
+        None,
+        order_payload.get("waiter"),
+        order_payload.get("customer_name"),
+    )
+    header["sales_invoice"] = invoice_name
+
+    items = [
+        {"item_code": row.item_code, "item_name": row.item_name, "qty": row.qty}
+        for row in frappe.get_all(
+            "Sales Invoice Item",
+            filters={"parenttype": "Sales Invoice", "parent": invoice_name},
+            fields=["item_code", "item_name", "qty"],
+            order_by="idx asc",
+        )
+    ]
+    remarks = {
+        (item.get("name") or item.get("item_code") or item.get("menu_item")): item.get("remark")
+        for item in order_payload.get("order_items", [])
+    }
+    for item in items:
+        item["remark"] = remarks.get(item["item_code"])
+
+    queue_tickets(invoice_name, header, items)
@@ -15,8 +15,49 @@ import frappe
 from frappe.utils import flt
 
 
-# Flag to track if fix has been applied
+# Flag to track if fix has been applied.
+# The fix is applied once per worker when the app package is imported (see __init__.py)
+# and again after migrate; requests never call apply_trial_balance_fix.
 _fix_applied = False
+# "not_applied", "applied", "erpnext_unavailable" or "error", reported by verify_trial_balance_fix
+_fix_status = "not_applied"
+
+
+def convert_gl_entries(gl_entries, presentation_currency, date, get_rate, use_account_currency_values=False):
+    """
+    Set debit / credit of GL entries in presentation currency (the body of the fixed
+    convert_to_presentation_currency).
+
+    With use_account_currency_values the account-currency amounts are used as they are.
+    Otherwise amounts in another account currency are divided by
+    get_rate(date, account_currency, presentation_currency); the rate is resolved once
+    per account currency instead of twice per entry. Only non-zero debit / credit are
+    replaced. Returns the entries as a list.
+    """
+    gl_entries = list(gl_entries)
+
+    if use_account_currency_values:
+        for entry in gl_entries:
+            entry["debit"] = flt(entry["debit_in_account_currency"])
+            entry["credit"] = flt(entry["credit_in_account_currency"])
+        return gl_entries
+
+    divisors = {
+        currency: get_rate(date, currency, presentation_currency) or 1
+        for currency in set(entry["account_currency"] for entry in gl_entries)
+        if currency != presentation_currency
+    }
+
+    for entry in gl_entries:
+        divisor = divisors.get(entry["account_currency"])
+        if entry.get("debit"):
+            debit = flt(entry["debit_in_account_currency"])
+            entry["debit"] = debit / divisor if divisor else debit
+        if entry.get("credit"):
+            credit = flt(entry["credit_in_account_currency"])
+            entry["credit"] = credit / divisor if divisor else credit
+
+    return gl_entries
 
 
 @frappe.whitelist()
@@ -31,6 +72,7 @@ def verify_trial_balance_fix():
         
         result = {
             "fix_applied": _fix_applied,
+            "status": _fix_status,
             "function_exists": hasattr(erpnext_utils, 'convert_to_presentation_currency'),
             "modules_checked": []
         }
@@ -61,7 +103,8 @@ def verify_trial_balance_fix():
     except Exception as e:
         return {
             "error": str(e),
-            "fix_applied": _fix_applied
+            "fix_applied": _fix_applied,
+            "status": _fix_status
         }
 
 
@@ -76,7 +119,7 @@ def apply_trial_balance_fix():
     
     This patch also updates modules that have already imported the function.
     """
-    global _fix_applied
+    global _fix_applied, _fix_status
     
     if _fix_applied:
         return
@@ -92,10 +135,8 @@ def apply_trial_balance_fix():
         if not hasattr(erpnext_utils, 'convert'):
             return
         
-        # Store original functions
-        original_convert = erpnext_utils.convert
-        original_get_rate_as_at = erpnext_utils.get_rate_as_at
-        
+        from havano_restaurant_pos.exchange_rates import get_report_rate
+
         def fixed_get_rate_as_at(date, from_currency, to_currency):
             """
             Fixed get_rate_as_at that handles inverse rates correctly.
@@ -104,43 +145,9 @@ def apply_trial_balance_fix():
             But for conversion, we need 33.2, not 0.0301.
             
             Solution: If we get a small rate (< 1.0), check if inverse exists and use that.
+            The resolved rate is cached per (from, to, date), see exchange_rates.get_report_rate.
             """
-            # Try to get the direct rate first
-            rate = original_get_rate_as_at(date, from_currency, to_currency)
-            
-            if from_currency != to_currency and rate:
-                # If rate is less than 1.0, it might be the inverse of what we need
-                # Example: If we need ZWG to USD rate and get 0.0301, 
-                # check if USD to ZWG rate exists (33.2) and use that instead
-                if 0 < rate < 1.0:
-                    try:
-                        from erpnext.setup.utils import get_exchange_rate
-                        # Try to get the inverse rate (to_currency to from_currency)
-                        inverse_rate = get_exchange_rate(to_currency, from_currency, date)
-                        if inverse_rate and inverse_rate > 1.0:
-                            # We found the inverse rate which is larger
-                            # Use the inverse rate directly (don't divide by it again)
-                            # Because: if 1 USD = 33.2 ZWG, then to convert ZWG to USD, divide by 33.2
-                            rate = inverse_rate
-                            # Cache the corrected rate
-                            erpnext_utils.__exchange_rates[f"{from_currency}-{to_currency}@{date}"] = rate
-                    except Exception:
-                        pass
-                # Also handle case where rate is 1, 0, or None (not found)
-                elif not rate or rate == 1 or rate == 0:
-                    try:
-                        from erpnext.setup.utils import get_exchange_rate
-                        # Try to get the inverse rate
-                        inverse_rate = get_exchange_rate(to_currency, from_currency, date)
-                        if inverse_rate and inverse_rate != 1 and inverse_rate != 0:
-                            # Use the inverse rate directly
-                            rate = inverse_rate
-                            # Cache the corrected rate
-                            erpnext_utils.__exchange_rates[f"{from_currency}-{to_currency}@{date}"] = rate
-                    except Exception:
-                        pass
-            
-            return rate or 1
+            return get_report_rate(date, from_currency, to_currency)
         
         def fixed_convert(value, from_, to, date):
             """
@@ -164,11 +171,9 @@ def apply_trial_balance_fix():
               and convert FROM account currency TO presentation currency
             - When account currency == presentation currency, use account currency values directly
             """
-            converted_gl_list = []
             presentation_currency = currency_info["presentation_currency"]
-            company_currency = currency_info["company_currency"]
 
-            account_currencies = list(set(entry["account_currency"] for entry in gl_entries))
+            account_currencies = set(entry["account_currency"] for entry in gl_entries)
             exchange_gain_or_loss = False
 
             if filters and isinstance(filters.get("account"), list):
@@ -177,46 +182,20 @@ def apply_trial_balance_fix():
 
                 exchange_gain_or_loss = len(account_filter) == 1 and account_filter[0] == gain_loss_account
 
-            for entry in gl_entries:
-                debit = flt(entry["debit"])
-                credit = flt(entry["credit"])
-                debit_in_account_currency = flt(entry["debit_in_account_currency"])
-                credit_in_account_currency = flt(entry["credit_in_account_currency"])
-                account_currency = entry["account_currency"]
-
-                if (
-                    len(account_currencies) == 1
-                    and account_currency == presentation_currency
-                    and not exchange_gain_or_loss
-                ) and not (filters and filters.get("show_amount_in_company_currency")):
-                    entry["debit"] = debit_in_account_currency
-                    entry["credit"] = credit_in_account_currency
-                else:
-                    date = currency_info["report_date"]
-                    # If account currency is different from presentation currency,
-                    # convert from account currency to presentation currency
-                    if account_currency != presentation_currency:
-                        converted_debit_value = fixed_convert(
-                            debit_in_account_currency, account_currency, presentation_currency, date
-                        )
-                        # converted_debit_value = debit_in_account_currency
-                        converted_credit_value = fixed_convert(
-                            credit_in_account_currency, account_currency, presentation_currency, date
-                        )
-                    else:
-                        # Account currency matches presentation currency, use account currency values directly
-                        converted_debit_value = debit_in_account_currency
-                        converted_credit_value = credit_in_account_currency
-
-                    if entry.get("debit"):
-                        entry["debit"] = converted_debit_value
-
-                    if entry.get("credit"):
-                        entry["credit"] = converted_credit_value
-
-                converted_gl_list.append(entry)
+            # the same for every row, so decided once instead of per entry
+            use_account_currency_values = (
+                account_currencies == {presentation_currency}
+                and not exchange_gain_or_loss
+                and not (filters and filters.get("show_amount_in_company_currency"))
+            )
 
-            return converted_gl_list
+            return convert_gl_entries(
+                gl_entries,
+                presentation_currency,
+                None if use_account_currency_values else currency_info["report_date"],
+                fixed_get_rate_as_at,
+                use_account_currency_values=use_account_currency_values,
+            )
         
         # Replace all three functions in the module
         erpnext_utils.get_rate_as_at = fixed_get_rate_as_at
@@ -247,6 +226,7 @@ def apply_trial_balance_fix():
                     updated_count += 1
         
         _fix_applied = True
+        _fix_status = "applied"
         
         # Verify the fix was applied
         if (erpnext_utils.convert_to_presentation_currency == fixed_convert_to_presentation_currency and
@@ -262,8 +242,9 @@ def apply_trial_balance_fix():
         
     except ImportError:
         # ERPNext not installed or not loaded yet - this is OK
-        pass
+        _fix_status = "erpnext_unavailable"
     except Exception as e:
+        _fix_status = "error"
         frappe.log_error(
             f"Error applying trial balance fix: {str(e)}\n{frappe.get_traceback()}",
             "Trial Balance Fix Error"
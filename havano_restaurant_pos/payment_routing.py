@@ -0,0 +1,231 @@
+"""
+Payment routing table for POS payments.
+
+Every tender of a sale needs the same facts: which account the money goes to, the
+account currency, the Mode of Payment type, whether the method is a credit method
+(no Payment Entry) and whether the Payment Entry needs bank reference fields.
+They are resolved once per company and cached in Redis, and invalidated when
+Mode of Payment (incl. its Mode of Payment Account rows), Account, Company or
+HA POS Settings change.
+
+With "Consolidate Split Payments" on, the tenders of one payment are posted together as
+one Journal Entry per currency (make_tender_journal_entries).
+"""
+
+import frappe
+from frappe.utils import flt, now_datetime, nowdate
+
+PAYMENT_ROUTES_KEY = "havano_pos:payment_routes"
+
+
+def clear_payment_routes(doc=None, method=None):
+    """doc_event / settings hook: drop all cached routing tables (again after commit)."""
+    _clear()
+    frappe.db.after_commit.add(_clear)
+
+
+def _clear():
+    frappe.cache().delete_value(PAYMENT_ROUTES_KEY)
+
+
+def get_payment_routes(company):
+    """Return the routing table for a company: {"company": {...}, "default": {...}, "modes": {...}}."""
+    return frappe.cache().hget(PAYMENT_ROUTES_KEY, company, generator=lambda: _build_routes(company))
+
+
+def get_payment_route(company, mode_of_payment):
+    """
+    Return the route for one tender as a dict with account, currency, mode_type,
+    account_type, is_credit and is_bank. Unknown modes are auto-created (as the POS
+    always did) and routed to the company's default cash account.
+    """
+    routes = get_payment_routes(company)
+    route = routes["modes"].get(mode_of_payment)
+    if route:
+        return frappe._dict(route)
+
+    if mode_of_payment and mode_of_payment != "Cash":
+        _create_mode_of_payment(mode_of_payment)
+
+    return frappe._dict(routes["default"], is_credit=_is_credit(mode_of_payment))
+
+
+def _is_credit(mode_of_payment):
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_payment_method,
+    )
+
+    method = get_payment_method(mode_of_payment) if mode_of_payment else None
+    return bool(method and method.is_credit)
+
+
+def _create_mode_of_payment(mode_of_payment):
+    if frappe.db.exists("Mode of Payment", mode_of_payment):
+        return
+    try:
+        new_mode = frappe.new_doc("Mode of Payment")
+        new_mode.mode_of_payment = mode_of_payment
+        new_mode.type = "Cash"  # Default type
+        new_mode.insert(ignore_permissions=True)
+        frappe.log_error(
+            f"Created new Mode of Payment '{mode_of_payment}' automatically",
+            "Mode of Payment Auto-Created"
+        )
+    except Exception as create_error:
+        # If creation fails the Payment Entry is still inserted with ignore_links
+        frappe.log_error(
+            f"Mode of Payment '{mode_of_payment}' does not exist and could not be created: {create_error!s}. Will use ignore_links to bypass validation.",
+            "Mode of Payment Creation Failed"
+        )
+
+
+def _build_routes(company):
+    company_data = frappe.db.get_value(
+        "Company",
+        company,
+        ["default_currency", "default_receivable_account", "default_cash_account"],
+        as_dict=True,
+    )
+    if not company_data:
+        return {"company": None, "default": {}, "modes": {}}
+
+    company_currency = company_data.default_currency
+    paid_from = company_data.default_receivable_account
+    paid_to = company_data.default_cash_account or paid_from
+
+    modes = frappe.get_all("Mode of Payment", fields=["name", "type"])
+
+    mode_accounts = {}
+    for row in frappe.get_all(
+        "Mode of Payment Account",
+        filters={"parenttype": "Mode of Payment", "company": company},
+        fields=["parent", "default_account"],
+        order_by="idx asc",
+    ):
+        if row.default_account:
+            mode_accounts.setdefault(row.parent, row.default_account)
+
+    account_names = {a for a in (paid_from, paid_to) if a} | set(mode_accounts.values())
+    accounts = {
+        row.name: row
+        for row in frappe.get_all(
+            "Account",
+            filters={"name": ["in", list(account_names)]},
+            fields=["name", "account_currency", "account_type"],
+        )
+    } if account_names else {}
+
+    def make_route(account, mode_type, is_credit):
+        account_row = accounts.get(account) or {}
+        account_type = account_row.get("account_type")
+        return {
+            "account": account,
+            "currency": account_row.get("account_currency") or company_currency,
+            "mode_type": mode_type,
+            "account_type": account_type,
+            "is_bank": mode_type == "Bank" or account_type == "Bank",
+            "is_credit": is_credit,
+        }
+
+    routes = {}
+    for mode in modes:
+        # "Cash" always posts to the company default cash account
+        account = mode_accounts.get(mode.name) if mode.name != "Cash" else None
+        routes[mode.name] = make_route(account or paid_to, mode.type, _is_credit(mode.name))
+
+    return {
+        "company": {
+            "default_currency": company_currency,
+            "paid_from": paid_from,
+            "paid_to": paid_to,
+            "paid_from_currency": (accounts.get(paid_from) or {}).get("account_currency") or company_currency,
+            "paid_to_currency": (accounts.get(paid_to) or {}).get("account_currency") or company_currency,
+        },
+        "default": make_route(paid_to, None, False),
+        "modes": routes,
+    }
+
+
+def make_tender_journal_entries(
+    company,
+    customer,
+    tenders,
+    receivable_account,
+    receivable_currency,
+    reference_doctype=None,
+    reference_name=None,
+    remark=None,
+):
+    """
+    Post split tenders as one Journal Entry per tender currency instead of one Payment
+    Entry per tender: a debit row per tender on its mode of payment account and one
+    credit row on the customer's receivable, against the invoice when given. Each
+    tender is a dict with mode_of_payment, account, currency, amount (account currency),
+    base_amount (company currency) and is_bank. Returns the submitted entry names.
+    """
+    from havano_restaurant_pos.exchange_rates import get_exchange_rate
+
+    company_currency = get_payment_routes(company)["company"]["default_currency"]
+    precision = frappe.get_precision("Journal Entry Account", "debit") or 2
+    posting_date = nowdate()
+
+    groups = {}
+    for tender in tenders:
+        if flt(tender["amount"]) > 0:
+            groups.setdefault(tender["currency"], []).append(tender)
+
+    receivable_rate = 1.0
+    if receivable_currency != company_currency:
+        receivable_rate = flt(get_exchange_rate(receivable_currency, company_currency, posting_date)) or 1.0
+
+    names = []
+    for currency, rows in groups.items():
+        modes = list(dict.fromkeys(row["mode_of_payment"] for row in rows))
+        lines = ", ".join(f"{row['mode_of_payment']}: {flt(row['amount'], 2)} {currency}" for row in rows)
+
+        journal_entry = frappe.new_doc("Journal Entry")
+        journal_entry.voucher_type = "Journal Entry"
+        journal_entry.company = company
+        journal_entry.posting_date = posting_date
+        journal_entry.multi_currency = int(currency != company_currency or receivable_currency != company_currency)
+        journal_entry.mode_of_payment = modes[0] if len(modes) == 1 else None
+        journal_entry.user_remark = f"{remark or 'POS payment'} | Tenders: {lines}"
+        if any(row.get("is_bank") for row in rows):
+            journal_entry.cheque_no = reference_name or f"REF-{now_datetime().strftime('%Y%m%d%H%M%S')}"
+            journal_entry.cheque_date = posting_date
+
+        total_base = 0.0
+        for row in rows:
+            amount = flt(row["amount"])
+            exchange_rate = flt(row["base_amount"]) / amount if currency != company_currency else 1.0
+            total_base += flt(amount * exchange_rate, precision)
+            journal_entry.append(
+                "accounts",
+                {
+                    "account": row["account"],
+                    "account_currency": currency,
+                    "exchange_rate": exchange_rate,
+                    "debit_in_account_currency": amount,
+                    "user_remark": row["mode_of_payment"],
+                },
+            )
+
+        journal_entry.append(
+            "accounts",
+            {
+                "account": receivable_account,
+                "account_currency": receivable_currency,
+                "exchange_rate": receivable_rate,
+                "credit_in_account_currency": flt(total_base / receivable_rate, precision),
+                "party_type": "Customer",
+                "party": customer,
+                "reference_type": reference_doctype,
+                "reference_name": reference_name,
+            },
+        )
+
+        journal_entry.insert(ignore_permissions=True)
+        journal_entry.submit()
+        names.append(journal_entry.name)
+
+    return names
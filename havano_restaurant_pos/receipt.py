@@ -0,0 +1,149 @@
+"""
+Receipt header cache.
+
+Everything on a receipt except the invoice and its items depends only on the company
+and the cost center of the till: Cost Center Details, Company name / phone / tax id and
+the company's primary address. _build_invoice_json used to look all of that up for
+every print. The header is cached in Redis per (company, cost center), together with
+user full names, and dropped when Company, Address, Cost Center Details or User change.
+"""
+
+import frappe
+
+RECEIPT_HEADER_KEY = "havano_pos:receipt_header"
+USER_FULL_NAME_KEY = "havano_pos:user_full_name"
+
+
+def clear_receipt_headers(doc=None, method=None):
+    """doc_event: drop cached headers and names (again after commit)."""
+    _clear()
+    frappe.db.after_commit.add(_clear)
+
+
+def _clear():
+    frappe.cache().delete_value([RECEIPT_HEADER_KEY, USER_FULL_NAME_KEY])
+
+
+def get_receipt_header(company, cost_center):
+    """
+    Return the cached receipt header for (company, cost_center):
+    {"cost_center_doc": {...} or None, "company": {...}, "address": {...}}.
+    """
+    return frappe.cache().hget(
+        RECEIPT_HEADER_KEY,
+        f"{company}:{cost_center}",
+        generator=lambda: _build_header(company, cost_center),
+    )
+
+
+def get_user_full_name(user):
+    if not user:
+        return None
+    return frappe.cache().hget(
+        USER_FULL_NAME_KEY, user, generator=lambda: frappe.db.get_value("User", user, "full_name")
+    )
+
+
+def _build_header(company, cost_center):
+    cost_center_doc = frappe.db.get_value(
+        "Cost Center Details",
+        {"cost_center": cost_center},
+        ["email", "address_line_1", "address_line_2", "phone", "company_name"],
+        as_dict=True,
+    ) if cost_center else None
+
+    company_fields = frappe.db.get_value(
+        "Company",
+        company,
+        ["company_name", "phone_no", "tax_id"],
+        as_dict=True,
+    ) or {}
+
+    return {
+        "cost_center_doc": dict(cost_center_doc) if cost_center_doc else None,
+        "company": dict(company_fields),
+        "address": _get_company_address(company),
+    }
+
+
+def _get_company_address(company):
+    """Primary company address, else any company address, as {city, state, pincode}."""
+    fields = ["address_line1", "address_line2", "city", "state", "pincode"]
+    link_filters = [
+        ["Dynamic Link", "link_doctype", "=", "Company"],
+        ["Dynamic Link", "link_name", "=", company],
+    ]
+    addr_list = frappe.get_all(
+        "Address",
+        filters=[*link_filters, ["Address", "is_primary_address", "=", 1]],
+        fields=fields,
+        limit=1,
+    )
+    if not addr_list:
+        addr_list = frappe.get_all("Address", filters=link_filters, fields=fields, limit=1)
+
+    addr = addr_list[0] if addr_list else {}
+    return {
+        "city": addr.get("city") or "",
+        "state": addr.get("state") or "",
+        "pincode": addr.get("pincode") or "",
+    }
+
+
+# Sales Invoice fields read by _build_invoice_json; optional ones (fiscal device apps,
+# custom fields) are only selected when the site has them
+INVOICE_FIELDS = [
+    "name", "company", "creation", "owner", "customer_name", "contact_display",
+    "contact_email", "tax_id", "customer_address", "grand_total", "currency",
+    "discount_amount", "base_net_total", "total_taxes_and_charges", "payment_terms_template",
+]
+OPTIONAL_INVOICE_FIELDS = [
+    "custom_change", "customer_trade_name", "vat_number", "custom_device_id",
+    "custom_device_serial_no", "custom_fiscal_day", "custom_receiptno", "customer_ref",
+    "custom_verification_code", "custom_invoice_qr_code",
+]
+ITEM_FIELDS = ["parent", "item_code", "item_name", "qty", "rate", "amount"]
+OPTIONAL_ITEM_FIELDS = ["tax_type", "tax_rate", "tax_amount", "custom_remarks"]
+
+# Values Document.getattr defaults would give for fields the site does not have
+ITEM_DEFAULTS = {"tax_type": "VAT", "tax_rate": 15.0, "tax_amount": 0.0, "custom_remarks": ""}
+
+
+def load_invoices(invoice_names):
+    """
+    Load Sales Invoices with their items in two queries, as frappe._dict objects that
+    _build_invoice_json accepts in place of documents. Keeps the order of `invoice_names`.
+    """
+    if not invoice_names:
+        return []
+
+    invoice_meta = frappe.get_meta("Sales Invoice")
+    item_meta = frappe.get_meta("Sales Invoice Item")
+    invoice_fields = INVOICE_FIELDS + [f for f in OPTIONAL_INVOICE_FIELDS if invoice_meta.has_field(f)]
+    item_fields = ITEM_FIELDS + [f for f in OPTIONAL_ITEM_FIELDS if item_meta.has_field(f)]
+
+    invoices = {
+        row.name: row
+        for row in frappe.get_all(
+            "Sales Invoice",
+            filters={"name": ["in", list(invoice_names)]},
+            fields=invoice_fields,
+        )
+    }
+    if not invoices:
+        return []
+    for invoice in invoices.values():
+        invoice.items = []
+
+    for row in frappe.get_all(
+        "Sales Invoice Item",
+        filters={"parenttype": "Sales Invoice", "parent": ["in", list(invoices)]},
+        fields=item_fields,
+        order_by="parent asc, idx asc",
+    ):
+        for field, default in ITEM_DEFAULTS.items():
+            if field not in row:
+                row[field] = default
+        invoices[row.parent].items.append(row)
+
+    return [invoices[name] for name in invoice_names if name in invoices]
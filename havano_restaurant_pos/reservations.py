@@ -0,0 +1,205 @@
+"""
+Projected-stock reservation ledger for open orders.
+
+Dine In orders deduct no stock until the table is paid, so busy items could be oversold.
+Open HA Orders (not yet invoiced) reserve their item quantities in a Redis hash keyed by
+"warehouse::item"; the reservation is added when the order is inserted and released when
+the order is settled, closed, voided, cancelled or deleted. Both happen after commit.
+Each order's reserved lines are kept as well, so a release is exact and happens once.
+
+Projected availability = Bin.actual_qty - reserved, readable with one Bin query and one
+HMGET for any number of items. rebuild_reservations recomputes the ledger from open orders.
+"""
+
+import json
+
+import frappe
+from frappe.utils import flt
+
+RESERVED_QTY_KEY = "havano_pos:reserved_qty"
+ORDER_RESERVATIONS_KEY = "havano_pos:order_reservations"
+
+STOCK_UPDATE_EVENT = "havano_stock_update"
+
+
+def _field(warehouse, item_code):
+    return f"{warehouse}::{item_code}"
+
+
+def _raw_key(key):
+    # the ledger uses plain Redis values (HINCRBYFLOAT), not RedisWrapper's pickled hashes
+    return frappe.cache().make_key(key)
+
+
+# -- reads --------------------------------------------------------------------
+
+def get_reserved_qty(warehouse, item_codes):
+    """item_code -> reserved qty in `warehouse` (one HMGET)."""
+    item_codes = list(item_codes)
+    if not warehouse or not item_codes:
+        return {}
+    values = frappe.cache().hmget(_raw_key(RESERVED_QTY_KEY), [_field(warehouse, code) for code in item_codes])
+    return {code: max(flt(value), 0) for code, value in zip(item_codes, values, strict=True)}
+
+
+def get_projected_stock(warehouse, item_codes):
+    """
+    Return (stock, projected) dicts for `item_codes` in `warehouse`: Bin actual_qty
+    (0 without a Bin) and actual_qty minus open-order reservations.
+    """
+    item_codes = list(item_codes)
+    stock = dict.fromkeys(item_codes, 0)
+    for row in frappe.get_all(
+        "Bin",
+        filters={"warehouse": warehouse, "item_code": ["in", item_codes]},
+        fields=["item_code", "actual_qty"],
+    ):
+        stock[row.item_code] = row.actual_qty or 0
+
+    reserved = get_reserved_qty(warehouse, item_codes)
+    projected = {code: flt(qty) - reserved.get(code, 0) for code, qty in stock.items()}
+    return stock, projected
+
+
+def publish_stock(warehouse, item_codes):
+    """Push current and projected stock of `item_codes` to POS clients."""
+    if not warehouse or not item_codes:
+        return
+    stock, projected = get_projected_stock(warehouse, item_codes)
+    frappe.publish_realtime(
+        STOCK_UPDATE_EVENT, {"warehouse": warehouse, "stock": stock, "projected": projected}
+    )
+
+
+# -- ledger -------------------------------------------------------------------
+
+def _order_lines(doc):
+    """Reservation lines of an order: [(warehouse, item_code, qty)], qty summed per item."""
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_user_mapping,
+    )
+
+    mapping = get_user_mapping(doc.owner)
+    warehouse = (mapping.warehouse if mapping else None) or frappe.db.get_single_value(
+        "Stock Settings", "default_warehouse"
+    )
+    if not warehouse:
+        return []
+
+    qty_by_item = {}
+    for row in doc.get("order_items") or []:
+        if row.menu_item and flt(row.qty) > 0:
+            qty_by_item[row.menu_item] = qty_by_item.get(row.menu_item, 0) + flt(row.qty)
+    return [(warehouse, item_code, qty) for item_code, qty in qty_by_item.items()]
+
+
+def _is_open(doc):
+    return doc.docstatus == 0 and doc.get("order_status") in (None, "", "Open") and not doc.get("sales_invoice")
+
+
+def reserve_order(order_name, lines):
+    """Add an order's lines to the ledger (once per order)."""
+    if not lines:
+        return
+    cache = frappe.cache()
+    # HSETNX: a second reserve of the same order is a no-op
+    if not cache.hsetnx(_raw_key(ORDER_RESERVATIONS_KEY), order_name, frappe.as_json(lines, indent=None)):
+        return
+
+    pipe = cache.pipeline()
+    for warehouse, item_code, qty in lines:
+        pipe.hincrbyfloat(_raw_key(RESERVED_QTY_KEY), _field(warehouse, item_code), qty)
+    pipe.execute()
+    _publish_lines(lines)
+
+
+def release_orders(order_names):
+    """Remove the reservations of the given orders (orders without one are skipped)."""
+    cache = frappe.cache()
+    released = []
+    for order_name in order_names:
+        raw = cache.execute_command("HGET", _raw_key(ORDER_RESERVATIONS_KEY), order_name)
+        # only the caller whose HDEL removed the record releases it
+        if not raw or not cache.execute_command("HDEL", _raw_key(ORDER_RESERVATIONS_KEY), order_name):
+            continue
+        released.extend(json.loads(raw))
+
+    if not released:
+        return
+
+    pipe = cache.pipeline()
+    for warehouse, item_code, qty in released:
+        pipe.hincrbyfloat(_raw_key(RESERVED_QTY_KEY), _field(warehouse, item_code), -flt(qty))
+    pipe.execute()
+    _publish_lines(released)
+
+
+def _publish_lines(lines):
+    by_warehouse = {}
+    for warehouse, item_code, _qty in lines:
+        by_warehouse.setdefault(warehouse, set()).add(item_code)
+    for warehouse, item_codes in by_warehouse.items():
+        publish_stock(warehouse, item_codes)
+
+
+def release_orders_after_commit(order_names):
+    order_names = list(order_names)
+    if order_names:
+        frappe.db.after_commit.add(lambda: release_orders(order_names))
+
+
+def rebuild_reservations():
+    """Recompute the whole ledger from open, not yet invoiced HA Orders (scheduler / repair)."""
+    orders = frappe.get_all(
+        "HA Order",
+        filters={"docstatus": 0, "order_status": "Open", "sales_invoice": ["is", "not set"]},
+        fields=["name", "owner"],
+    )
+    items = {}
+    if orders:
+        for row in frappe.get_all(
+            "HA Order Item",
+            filters={"parenttype": "HA Order", "parent": ["in", [order.name for order in orders]]},
+            fields=["parent", "menu_item", "qty"],
+        ):
+            items.setdefault(row.parent, []).append(row)
+
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.delete(_raw_key(RESERVED_QTY_KEY), _raw_key(ORDER_RESERVATIONS_KEY))
+    for order in orders:
+        order.order_items = items.get(order.name, [])
+        lines = _order_lines(order)
+        if not lines:
+            continue
+        pipe.hset(_raw_key(ORDER_RESERVATIONS_KEY), order.name, frappe.as_json(lines, indent=None))
+        for warehouse, item_code, qty in lines:
+            pipe.hincrbyfloat(_raw_key(RESERVED_QTY_KEY), _field(warehouse, item_code), qty)
+    pipe.execute()
+
+
+# -- doc events (HA Order) ----------------------------------------------------
+
+def on_order_insert(doc, method=None):
+    if not _is_open(doc):
+        return
+    order_name, lines = doc.name, _order_lines(doc)
+    if lines:
+        frappe.db.after_commit.add(lambda: reserve_order(order_name, lines))
+
+
+def on_order_change(doc, method=None):
+    """
+    on_update / on_submit / on_cancel / on_trash: release once the order is no longer open;
+    an open order saved with changed items is reserved again.
+    """
+    if method == "on_trash" or not _is_open(doc):
+        release_orders_after_commit([doc.name])
+    elif method == "on_update" and not doc.flags.in_insert:
+        order_name, lines = doc.name, _order_lines(doc)
+
+        def rereserve():
+            release_orders([order_name])
+            reserve_order(order_name, lines)
+
+        frappe.db.after_commit.add(rereserve)
@@ -0,0 +1,238 @@
+"""
+Item search index for the till.
+
+search_items used `item_name LIKE '%term%'` (no index) and get_item_by_barcode needed three
+round-trips. Searchable item rows and a barcode -> item map are kept in Redis hashes,
+updated per item from the Item doc events (Item Barcode rows are saved with their Item).
+Each worker keeps a sorted token list built from the Redis rows for prefix / token search
+and rebuilds it only when the index token changes. Barcodes are an exact Redis lookup.
+"""
+
+import re
+from bisect import bisect_left
+
+import frappe
+
+ITEM_SEARCH_KEY = "havano_pos:item_search"
+BARCODE_INDEX_KEY = "havano_pos:item_barcodes"
+SEARCH_TOKEN_KEY = "havano_pos:item_search_token"
+
+ITEM_FIELDS = [
+    "name", "item_code", "item_name", "description", "stock_uom", "standard_rate",
+    "item_group", "custom_menu_category", "image", "custom_do_not_show_in_pos",
+]
+
+SEARCH_LIMIT = 20
+
+_TOKEN_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# site -> (token, index); see ha_pos_settings._worker_index
+_worker_index = {}
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.split((text or "").lower()) if token]
+
+
+# -- Redis side ---------------------------------------------------------------
+
+def _ensure_built():
+    """Build the Redis hashes on a cold cache; returns the current index token."""
+    token = frappe.cache().get_value(SEARCH_TOKEN_KEY)
+    if token:
+        return token
+
+    rows = _load_items()
+    cache = frappe.cache()
+    cache.delete_value([ITEM_SEARCH_KEY, BARCODE_INDEX_KEY])
+    for row in rows:
+        cache.hset(ITEM_SEARCH_KEY, row["name"], row)
+        for barcode in row["barcodes"]:
+            cache.hset(BARCODE_INDEX_KEY, barcode, row["name"])
+    return _new_token()
+
+
+def _new_token():
+    token = frappe.generate_hash(length=10)
+    frappe.cache().set_value(SEARCH_TOKEN_KEY, token)
+    return token
+
+
+def _load_items(item_codes=None):
+    """Searchable rows (enabled items) with their barcodes, two queries."""
+    filters = {"disabled": 0}
+    if item_codes is not None:
+        filters["name"] = ["in", list(item_codes)]
+    items = frappe.get_all("Item", filters=filters, fields=ITEM_FIELDS)
+    if not items:
+        return []
+
+    barcode_filters = {"parenttype": "Item"}
+    if item_codes is not None:
+        barcode_filters["parent"] = ["in", [item.name for item in items]]
+    barcodes = {}
+    for row in frappe.get_all("Item Barcode", filters=barcode_filters, fields=["parent", "barcode"]):
+        if row.barcode:
+            barcodes.setdefault(row.parent, []).append(str(row.barcode).strip())
+
+    for item in items:
+        item["barcodes"] = barcodes.get(item.name, [])
+    return [dict(item) for item in items]
+
+
+def reindex_items(item_codes, removed=()):
+    """Refresh the rows of `item_codes` (dropping disabled ones) and drop `removed`."""
+    if not frappe.cache().get_value(SEARCH_TOKEN_KEY):
+        return  # not built yet, the next search builds it from the database
+
+    cache = frappe.cache()
+    fresh = {row["name"]: row for row in _load_items(item_codes)} if item_codes else {}
+
+    for item_code in set(item_codes) | set(removed):
+        old = cache.hget(ITEM_SEARCH_KEY, item_code)
+        if old:
+            for barcode in old.get("barcodes") or []:
+                cache.hdel(BARCODE_INDEX_KEY, barcode)
+        row = fresh.get(item_code)
+        if row:
+            cache.hset(ITEM_SEARCH_KEY, item_code, row)
+            for barcode in row["barcodes"]:
+                cache.hset(BARCODE_INDEX_KEY, barcode, item_code)
+        elif old:
+            cache.hdel(ITEM_SEARCH_KEY, item_code)
+
+    _new_token()
+
+
+def on_item_change(doc, method=None):
+    """doc_event (Item): reindex the item once the save is committed."""
+    item_code = doc.name
+    if method == "on_trash":
+        frappe.db.after_commit.add(lambda: reindex_items([], removed=[item_code]))
+    else:
+        frappe.db.after_commit.add(lambda: reindex_items([item_code]))
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+    """doc_event (Item after_rename)."""
+    frappe.db.after_commit.add(lambda: reindex_items([new or doc.name], removed=[old] if old else []))
+
+
+# -- Worker side --------------------------------------------------------------
+
+def _get_worker_index():
+    site = getattr(frappe.local, "site", None)
+    token = _ensure_built()
+    cached = _worker_index.get(site)
+    if cached and cached[0] == token:
+        return cached[1]
+
+    index = build_index(frappe.cache().hgetall(ITEM_SEARCH_KEY).values())
+    _worker_index[site] = (token, index)
+    return index
+
+
+def build_index(rows):
+    """
+    Build the in-memory search structures from item rows:
+    rows (code -> row), codes (lowercase code -> code), names (code -> lowercase name/code,
+    for substring fallback) and tokens (sorted (token, code) pairs for prefix lookup).
+    """
+    rows = {row["name"]: row for row in rows}
+    tokens = set()
+    names = {}
+    for code, row in rows.items():
+        name = (row.get("item_name") or "").lower()
+        names[code] = f"{name} {code.lower()}"
+        for token in tokenize(name) + tokenize(code) + [code.lower()]:
+            tokens.add((token, code))
+    codes = {code.lower(): code for code in rows}
+    return {"rows": rows, "codes": codes, "names": names, "tokens": sorted(tokens)}
+
+
+def _prefix_matches(tokens, prefix):
+    matches = set()
+    start = bisect_left(tokens, (prefix, ""))
+    for token, code in tokens[start:]:
+        if not token.startswith(prefix):
+            break
+        matches.add(code)
+    return matches
+
+
+def find_items(index, term, limit=SEARCH_LIMIT):
+    """
+    Item codes matching `term`: exact code first, then items where every word of the term
+    is a token prefix, then plain substring matches on name / code (the old LIKE search).
+    Each group is ordered by item name.
+    """
+    rows = index["rows"]
+    term = (term or "").strip().lower()
+
+    def by_name(code):
+        return ((rows[code].get("item_name") or "").lower(), code)
+
+    if not term:
+        return sorted(rows, key=by_name)[:limit]
+
+    exact = index["codes"].get(term)
+    result = [exact] if exact else []
+    seen = set(result)
+
+    words = tokenize(term)
+    if words:
+        matches = _prefix_matches(index["tokens"], words[0])
+        for word in words[1:]:
+            matches &= _prefix_matches(index["tokens"], word)
+        for code in sorted(matches - seen, key=by_name):
+            result.append(code)
+            seen.add(code)
+
+    if len(result) < limit:
+        substring = [code for code, name in index["names"].items() if code not in seen and term in name]
+        result.extend(sorted(substring, key=by_name))
+
+    return result[:limit]
+
+
+# -- Public lookups -----------------------------------------------------------
+
+def search(term, limit=SEARCH_LIMIT):
+    """Priced item rows matching `term`."""
+    index = _get_worker_index()
+    return apply_user_prices([dict(index["rows"][code]) for code in find_items(index, term, limit)])
+
+
+def lookup_barcode(barcode):
+    """Priced item row for an exact barcode, or None."""
+    _ensure_built()
+    item_code = frappe.cache().hget(BARCODE_INDEX_KEY, str(barcode).strip())
+    row = frappe.cache().hget(ITEM_SEARCH_KEY, item_code) if item_code else None
+    if not row:
+        return None
+    return apply_user_prices([dict(row)])[0]
+
+
+def apply_user_prices(items):
+    """Replace standard_rate with the rate from the user's price list (one query)."""
+    from havano_restaurant_pos.havano_restaurant_pos.doctype.ha_pos_settings.ha_pos_settings import (
+        get_user_mapping,
+    )
+
+    mapping = get_user_mapping()
+    price_list = mapping.price_list if mapping else None
+    if not price_list or not items:
+        return items
+
+    rates = {}
+    for row in frappe.get_all(
+        "Item Price",
+        filters={"price_list": price_list, "item_code": ["in", [item["name"] for item in items]]},
+        fields=["item_code", "price_list_rate"],
+    ):
+        rates.setdefault(row.item_code, row.price_list_rate)
+
+    for item in items:
+        if item["name"] in rates:
+            item["standard_rate"] = rates[item["name"]]
+    return items
@@ -0,0 +1,112 @@
+"""
+Table settlement helpers.
+
+Closing a table used to load every HA Order with its own exists() + get_doc() pair,
+merge the items with a nested list scan and submit each order separately. These helpers
+load all orders and items of a table with two queries, merge items through a dict and
+close the orders with one bulk update per table, so the cost of settling a table no
+longer grows in round-trips with the number of orders on it.
+"""
+
+import frappe
+from frappe.utils import now
+
+from havano_restaurant_pos.reservations import release_orders_after_commit
+
+
+def load_settleable_orders(order_ids):
+    """
+    Return (orders, items) for the given HA Orders that can still be settled,
+    i.e. not cancelled, not Closed and without a payment entry. Orders keep the
+    requested order; items are in order / idx order.
+    """
+    if not order_ids:
+        return [], []
+
+    rows = frappe.get_all(
+        "HA Order",
+        filters={"name": ["in", list(order_ids)], "docstatus": ["<", 2]},
+        fields=["name", "docstatus", "order_status", "payment_entry"],
+    )
+    by_name = {row.name: row for row in rows}
+
+    orders = []
+    for order_id in order_ids:
+        order = by_name.pop(order_id, None)
+        if not order or order.payment_entry or order.order_status == "Closed":
+            continue
+        orders.append(order)
+
+    if not orders:
+        return [], []
+
+    position = {order.name: idx for idx, order in enumerate(orders)}
+    items = frappe.get_all(
+        "HA Order Item",
+        filters={"parenttype": "HA Order", "parent": ["in", list(position)]},
+        fields=["parent", "idx", "menu_item", "qty", "rate", "amount"],
+    )
+    items.sort(key=lambda item: (position[item.parent], item.idx))
+    return orders, items
+
+
+def merge_order_items(items):
+    """
+    Merge items with the same menu_item and rate, keeping first-seen order.
+    The merged amount is qty * rate, as before.
+    """
+    merged = {}
+    for item in items:
+        key = (item["menu_item"], item["rate"])
+        row = merged.get(key)
+        if row:
+            row["qty"] = row["qty"] + item["qty"]
+            row["amount"] = row["qty"] * row["rate"]
+        else:
+            merged[key] = {
+                "menu_item": item["menu_item"],
+                "qty": item["qty"],
+                "rate": item["rate"],
+                "amount": item["amount"],
+            }
+    return list(merged.values())
+
+
+def close_orders(order_names, sales_invoice, payment_entry=None):
+    """
+    Link the orders to the invoice / payment, mark them Closed and submitted, in one
+    statement for the orders and one for their items. HA Order has no submit hooks,
+    so a direct update is equivalent to submitting each order.
+    """
+    if not order_names:
+        return
+
+    values = {
+        "names": tuple(order_names),
+        "sales_invoice": sales_invoice,
+        "payment_entry": payment_entry,
+        "modified": now(),
+        "modified_by": frappe.session.user,
+    }
+
+    frappe.db.sql(
+        """
+        update `tabHA Order`
+        set docstatus = 1, order_status = 'Closed', sales_invoice = %(sales_invoice)s,
+            payment_entry = coalesce(%(payment_entry)s, payment_entry),
+            modified = %(modified)s, modified_by = %(modified_by)s
+        where name in %(names)s and docstatus < 2
+        """,
+        values,
+    )
+    frappe.db.sql(
+        """
+        update `tabHA Order Item`
+        set docstatus = 1
+        where parenttype = 'HA Order' and parent in %(names)s and docstatus = 0
+        """,
+        values,
+    )
+
+    # the direct update skips the HA Order hooks, release the stock reservations here
+    release_orders_after_commit(order_names)
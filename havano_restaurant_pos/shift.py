@@ -0,0 +1,94 @@
+"""
+Shift totals accumulator.
+
+Every payment used to reload the whole HA Shift POS, search shift_amounts for the
+payment key and save the document back, so two tills of the same user could overwrite
+each other's totals. Amounts are now added in SQL: the shift row is locked (SELECT ...
+FOR UPDATE), existing Shift Amounts rows get `amount = amount + %s` and missing keys are
+inserted, all inside the caller's transaction.
+"""
+
+import frappe
+from frappe.utils import flt, now
+
+
+def get_open_shift(user):
+    """Name of the user's most recent open HA Shift POS, or None."""
+    return frappe.db.get_value(
+        "HA Shift POS",
+        {"user": user, "status": "Open"},
+        "name",
+        order_by="creation desc",
+    )
+
+
+def add_shift_amounts(shift_name, amounts):
+    """Add {payment_method: amount} to the shift's shift_amounts rows."""
+    amounts = {key: flt(amount) for key, amount in amounts.items() if key}
+    if not amounts:
+        return
+
+    # serialises concurrent payments on the same shift until commit
+    frappe.db.sql("select name from `tabHA Shift POS` where name = %s for update", shift_name)
+
+    rows = frappe.db.sql(
+        """
+        select name, payment_method, idx
+        from `tabShift Amounts`
+        where parenttype = 'HA Shift POS' and parentfield = 'shift_amounts' and parent = %s
+        """,
+        shift_name,
+        as_dict=True,
+    )
+    existing = {row.payment_method: row.name for row in rows}
+    idx = max((row.idx or 0 for row in rows), default=0)
+    timestamp = now()
+
+    for payment_method, amount in amounts.items():
+        if payment_method in existing:
+            frappe.db.sql(
+                """
+                update `tabShift Amounts`
+                set amount = ifnull(amount, 0) + %s, modified = %s
+                where name = %s
+                """,
+                (amount, timestamp, existing[payment_method]),
+            )
+            continue
+
+        idx += 1
+        row = frappe.get_doc(
+            {
+                "doctype": "Shift Amounts",
+                "parent": shift_name,
+                "parenttype": "HA Shift POS",
+                "parentfield": "shift_amounts",
+                "idx": idx,
+                "payment_method": payment_method,
+                "amount": amount,
+            }
+        )
+        row.db_insert()
+
+    # the shift form sees the change as a newer version
+    frappe.db.sql(
+        "update `tabHA Shift POS` set modified = %s, modified_by = %s where name = %s",
+        (timestamp, frappe.session.user, shift_name),
+    )
+
+
+def get_shift_totals(user):
+    """payment_method -> total amount over the user's open shifts (one query)."""
+    rows = frappe.db.sql(
+        """
+        select sa.payment_method, sum(sa.amount) as amount
+        from `tabShift Amounts` sa
+        inner join `tabHA Shift POS` shift on shift.name = sa.parent
+        where sa.parenttype = 'HA Shift POS' and sa.parentfield = 'shift_amounts'
+            and shift.user = %s and shift.status = 'Open'
+        group by sa.payment_method
+        """,
+        user,
+        as_dict=True,
+    )
+    return {row.payment_method: flt(row.amount) for row in rows}
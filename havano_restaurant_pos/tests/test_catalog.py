@@ -0,0 +1,140 @@
+# Copyright (c) 2025, showline and Contributors
+# See license.txt
+
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from havano_restaurant_pos.catalog import attach_prices_and_barcodes, index_item_prices
+
+UOMS = ("Nos", "Plate", "Box", "Kg")
+
+
+def make_catalog(item_count, prices_per_item=2):
+	items = [{"name": f"ITEM-{i:06d}"} for i in range(item_count)]
+	price_rows = [
+		{"item_code": item["name"], "uom": UOMS[p % len(UOMS)], "price_list_rate": float(i + p)}
+		for i, item in enumerate(items)
+		for p in range(prices_per_item)
+	]
+	return items, price_rows
+
+
+class CountingDict(dict):
+	"""Dict that counts key reads, to measure work without timing."""
+
+	reads = 0
+
+	def __getitem__(self, key):
+		CountingDict.reads += 1
+		return super().__getitem__(key)
+
+	def get(self, key, default=None):
+		CountingDict.reads += 1
+		return super().get(key, default)
+
+
+def count_reads(item_count):
+	items, price_rows = make_catalog(item_count)
+	price_rows = [CountingDict(row) for row in price_rows]
+
+	CountingDict.reads = 0
+	attach_prices_and_barcodes(items, CountingDict(index_item_prices(price_rows)), {})
+	return CountingDict.reads
+
+
+def make_menu_rows(item_count, prices_per_item=2):
+	"""Item, Item Price and Item Barcode rows as frappe.get_all returns them to _build_menu_items."""
+	items, price_rows = make_catalog(item_count, prices_per_item)
+	return {
+		"Item": [frappe._dict(item, item_name=item["name"], standard_rate=0) for item in items],
+		"Item Price": [frappe._dict(row) for row in price_rows],
+		"Item Barcode": [
+			frappe._dict(parent=item["name"], barcode=f"600{i:07d}") for i, item in enumerate(items)
+		],
+	}
+
+
+def build_with_nested_loop(rows):
+	"""The previous price attachment: every item scanned the whole (item, uom) price map."""
+	items = [dict(row) for row in rows["Item"]]
+	item_prices = {}
+	for p in rows["Item Price"]:
+		item_prices[(p.item_code, p.uom)] = p.price_list_rate
+
+	barcodes_by_item = {}
+	for row in rows["Item Barcode"]:
+		barcodes_by_item.setdefault(row["parent"], []).append(row.get("barcode") or "")
+
+	for item in items:
+		item["prices_by_uom"] = {uom: price for (code, uom), price in item_prices.items() if code == item["name"]}
+		item["barcodes"] = barcodes_by_item.get(item["name"], [])
+	return items
+
+
+def call_menu_endpoint(rows):
+	"""
+	Run get_menu_items_with_user_prices with a cold catalog cache, serving its get_all
+	calls from `rows`. Returns (items, doctypes queried).
+	"""
+	from havano_restaurant_pos import api
+
+	queried = []
+
+	def get_all(doctype, *args, **kwargs):
+		queried.append(doctype)
+		return [frappe._dict(row) for row in rows[doctype]]
+
+	with (
+		patch.object(api, "_get_menu_user_context", return_value=("Standard Selling", None, False)),
+		patch("havano_restaurant_pos.catalog.get_catalog_snapshot", lambda *args: args[3]()),
+		patch("frappe.get_all", get_all),
+	):
+		items = api.get_menu_items_with_user_prices()
+	return items, queried
+
+
+def timed(fn, *args):
+	start = time.perf_counter()
+	fn(*args)
+	return time.perf_counter() - start
+
+
+class TestCatalog(FrappeTestCase):
+	def test_prices_grouped_per_item(self):
+		items, price_rows = make_catalog(3)
+		price_rows.append({"item_code": "ITEM-000001", "uom": "Nos", "price_list_rate": 99.0})
+
+		attach_prices_and_barcodes(items, index_item_prices(price_rows), {"ITEM-000002": ["6001"]})
+
+		self.assertEqual(items[0]["prices_by_uom"], {"Nos": 0.0, "Plate": 1.0})
+		# later row for the same (item, uom) wins
+		self.assertEqual(items[1]["prices_by_uom"], {"Nos": 99.0, "Plate": 2.0})
+		self.assertEqual(items[2]["barcodes"], ["6001"])
+		self.assertEqual(items[0]["barcodes"], [])
+
+	def test_price_attachment_scales_linearly(self):
+		"""Each price row is read once and each item looks up its prices once (no nested scan)."""
+		self.assertEqual(count_reads(500), 500 * 2 * 3 + 500)
+		self.assertEqual(count_reads(4000), 8 * count_reads(500))
+
+	def test_menu_endpoint_queries_once_per_doctype(self):
+		for item_count in (10, 2000):
+			rows = make_menu_rows(item_count)
+			items, queried = call_menu_endpoint(rows)
+
+			self.assertEqual(sorted(queried), ["Item", "Item Barcode", "Item Price"])
+			self.assertEqual(items, build_with_nested_loop(rows))
+
+	@unittest.skipUnless(os.environ.get("HAVANO_POS_BENCHMARK"), "set HAVANO_POS_BENCHMARK=1 to run benchmarks")
+	def test_menu_endpoint_faster_than_nested_loop(self):
+		"""Benchmark: 5k items with two prices each through the endpoint vs the old nested loop."""
+		rows = make_menu_rows(5000)
+		nested = min(timed(build_with_nested_loop, rows) for _ in range(3))
+		endpoint = min(timed(call_menu_endpoint, rows) for _ in range(3))
+
+		self.assertLess(endpoint * 10, nested)
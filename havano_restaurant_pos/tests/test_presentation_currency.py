@@ -0,0 +1,123 @@
+# Copyright (c) 2025, showline and Contributors
+# See license.txt
+
+import copy
+import os
+import random
+import time
+import unittest
+
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from havano_restaurant_pos.overrides import convert_gl_entries
+
+RATES = {"ZWG": 33.2, "ZAR": 18.4, "EUR": 0.92}
+REPORT_DATE = "2026-06-30"
+
+
+def get_rate(date, from_currency, to_currency):
+	return RATES.get(from_currency, 1)
+
+
+def convert_per_row(gl_entries, presentation_currency, date, use_account_currency_values=False):
+	"""The previous per-entry conversion, kept as the reference result."""
+
+	def convert(value, from_, to, date):
+		return flt(value) / (get_rate(date, from_, to) or 1)
+
+	converted_gl_list = []
+	for entry in gl_entries:
+		debit_in_account_currency = flt(entry["debit_in_account_currency"])
+		credit_in_account_currency = flt(entry["credit_in_account_currency"])
+		account_currency = entry["account_currency"]
+
+		if use_account_currency_values:
+			entry["debit"] = debit_in_account_currency
+			entry["credit"] = credit_in_account_currency
+		else:
+			if account_currency != presentation_currency:
+				converted_debit_value = convert(debit_in_account_currency, account_currency, presentation_currency, date)
+				converted_credit_value = convert(credit_in_account_currency, account_currency, presentation_currency, date)
+			else:
+				converted_debit_value = debit_in_account_currency
+				converted_credit_value = credit_in_account_currency
+
+			if entry.get("debit"):
+				entry["debit"] = converted_debit_value
+
+			if entry.get("credit"):
+				entry["credit"] = converted_credit_value
+
+		converted_gl_list.append(entry)
+
+	return converted_gl_list
+
+
+def make_gl_entries(count, currencies=("USD", "ZWG", "ZAR", "EUR")):
+	rng = random.Random(42)
+	entries = []
+	for i in range(count):
+		currency = currencies[i % len(currencies)]
+		amount = round(rng.uniform(0, 5000), 2)
+		is_debit = rng.random() < 0.5
+		entries.append(
+			{
+				"account": f"ACC-{i % 40}",
+				"account_currency": currency,
+				"debit": amount if is_debit else 0.0,
+				"credit": 0.0 if is_debit else amount,
+				"debit_in_account_currency": amount * RATES.get(currency, 1) if is_debit else 0.0,
+				"credit_in_account_currency": 0.0 if is_debit else amount * RATES.get(currency, 1),
+			}
+		)
+	return entries
+
+
+def timed(fn, entries):
+	entries = copy.deepcopy(entries)
+	start = time.perf_counter()
+	fn(entries)
+	return time.perf_counter() - start
+
+
+class TestPresentationCurrency(FrappeTestCase):
+	def test_matches_per_row_conversion(self):
+		entries = make_gl_entries(2000)
+		entries.append(
+			{
+				"account_currency": "ZWG",
+				"debit": 0,
+				"credit": 0,
+				"debit_in_account_currency": "10",
+				"credit_in_account_currency": None,
+			}
+		)
+
+		expected = convert_per_row(copy.deepcopy(entries), "USD", REPORT_DATE)
+		result = convert_gl_entries(copy.deepcopy(entries), "USD", REPORT_DATE, get_rate)
+		self.assertEqual(result, expected)
+
+		single = make_gl_entries(50, currencies=("USD",))
+		expected = convert_per_row(copy.deepcopy(single), "USD", REPORT_DATE, use_account_currency_values=True)
+		result = convert_gl_entries(copy.deepcopy(single), "USD", None, get_rate, use_account_currency_values=True)
+		self.assertEqual(result, expected)
+
+	def test_rate_resolved_once_per_currency(self):
+		calls = []
+
+		def counting_rate(date, from_currency, to_currency):
+			calls.append(from_currency)
+			return get_rate(date, from_currency, to_currency)
+
+		convert_gl_entries(make_gl_entries(1000), "USD", REPORT_DATE, counting_rate)
+		self.assertEqual(sorted(calls), ["EUR", "ZAR", "ZWG"])
+
+	@unittest.skipUnless(os.environ.get("HAVANO_POS_BENCHMARK"), "set HAVANO_POS_BENCHMARK=1 to run benchmarks")
+	def test_faster_than_per_row_conversion(self):
+		"""Benchmark: 200k synthetic GL entries in four currencies."""
+		entries = make_gl_entries(200000)
+		per_row = min(timed(lambda e: convert_per_row(e, "USD", REPORT_DATE), entries) for _ in range(3))
+		columnar = min(timed(lambda e: convert_gl_entries(e, "USD", REPORT_DATE, get_rate), entries) for _ in range(3))
+
+		self.assertLess(columnar, per_row)